@@ -1,23 +1,64 @@
 # app.py
 
 # config de page
+import os
+import json
+import time
+
 import streamlit as st
 import pandas as pd
-import numpy as np
 from pathlib import Path
 import altair as alt
 
+from dates import AmbiguousDateFormat
+from columns import MappedColumns, columns_exist
+from store import store_exists, store_columns, store_levels
+from rollups import Rollups
+from query import (DATE_COL, KNOWN_PRODUCTS, GRANULARITIES, TOPK_STACK, JOURS, iter_source_chunks,
+                   snap_range_to_available, kpis_from_resampled, stack_frame, ranking, heatmap_frame)
+from registry import DatasetRegistry, bytes_digest, file_digest
+from downsample import lttb_indices, minmax_indices, point_budget
+from profiling import Profiler, merge_traces
+from upload import UploadJob, read_upload_header
+
+import rootpath  # noqa: F401  (ingest.py, à la racine du dépôt)
+from ingest import read_csv
+
 st.set_page_config(page_title="Pharma analyse light", layout="wide")
 st.title("Analyse des ventes pharmaceutiques")
 
 # constantes
 DEFAULT_PATH = Path("pharma_consolidated_full.csv")
-DATE_COL = "datum"
-KNOWN_PRODUCTS = ["M01AB", "M01AE", "N02BA", "N02BE", "N05B", "N05C", "R03", "R06"]
-TOPK_STACK = 8
-SAMPLE_THRESHOLD = 2_000_000
-SAMPLE_FRAC = 0.25
-FAST_MODE = True
+STORE_PATH = Path("pharma_store")
+COLUMNS_PATH = Path("pharma_columns")
+CHART_WIDTH_PX = 1400  # largeur de référence des graphiques pleine largeur
+CHUNK_ROWS = 500_000  # lignes lues à la fois ; seuls les agrégats restent en mémoire
+PROFILE_DEFAULT = os.environ.get("RUSH2_PROFILE") == "1"
+TRACE_RUNS = 20  # passages gardés pour l'export de trace
+REFRESH_S = 0.5  # import en cours : intervalle entre deux affichages partiels
+
+# profilage : désactivé, chaque étape coûte un appel de fonction
+run_start = time.perf_counter()
+prof_panel = st.sidebar.expander("Profilage", expanded=PROFILE_DEFAULT)
+with prof_panel:
+    profiling_on = st.toggle("Chronométrer les étapes", value=PROFILE_DEFAULT)
+    profiling_mem = st.toggle("Mesurer la mémoire (tracemalloc, plus lent)", value=False, disabled=not profiling_on)
+# profileur du passage, fermé à chaque sortie (stop() ou fin du script) : tracemalloc ne reste pas actif ;
+# celui d'un passage interrompu par une exception est fermé au passage suivant
+stale = st.session_state.get("profileur")
+if stale is not None:
+    stale.close()
+prof = st.session_state["profileur"] = Profiler(enabled=profiling_on, memory=profiling_mem, name="app")
+
+loading = False  # import en cours (voir plus bas)
+
+def stop():
+    """Fin du passage : st.stop, ou nouvel affichage partiel un peu plus tard tant que l'import est en cours."""
+    prof.close()
+    if loading:
+        time.sleep(REFRESH_S)
+        st.rerun()
+    st.stop()
 
 # chargement fichier
 with st.sidebar:
@@ -26,84 +67,156 @@ with st.sidebar:
     if use_uploader:
         uploaded = st.file_uploader("Déposer un CSV", type=["csv"])
         if uploaded is None:
-            st.stop()
-        head_source = uploaded
+            stop()
         path = None
     else:
-        if not DEFAULT_PATH.exists():
+        levels = None
+        if columns_exist(COLUMNS_PATH) or store_exists(STORE_PATH):
+            # colonnes memmap (sinon store Parquet) : on ne lit que les granularités demandées
+            path = COLUMNS_PATH if columns_exist(COLUMNS_PATH) else STORE_PATH
+            all_levels = MappedColumns(path).levels if path == COLUMNS_PATH else store_levels(path)
+            levels = st.multiselect("Granularités sources", options=all_levels, default=all_levels)
+            if not levels:
+                st.info("sélectionner au moins une granularité source")
+                stop()
+            head_source = path
+        elif not DEFAULT_PATH.exists():
             st.error(f"Fichier introuvable {DEFAULT_PATH.resolve()}")
-            st.stop()
-        head_source = DEFAULT_PATH
-        path = DEFAULT_PATH
+            stop()
+        else:
+            head_source = DEFAULT_PATH
+            path = DEFAULT_PATH
+
+# un registre par processus : une copie par contenu, partagée par toutes les sessions
+@st.cache_resource
+def get_registry():
+    return DatasetRegistry()
+
+# imports en cours, par empreinte : une session qui réimporte le même fichier suit le même chargement
+@st.cache_resource
+def get_uploads():
+    return {}
+
+registry = get_registry()
+uploads = get_uploads()
 
 # detection colonnes disponibles
 def read_head(src):
+    if isinstance(src, Path) and columns_exist(src):
+        return pd.DataFrame(columns=MappedColumns(src).columns)
+    if isinstance(src, Path) and src.is_dir():
+        return pd.DataFrame(columns=store_columns(src))
     if isinstance(src, Path):
-        return pd.read_csv(src, nrows=5)
-    else:
-        src.seek(0)
-        dfh = pd.read_csv(src, nrows=5)
-        src.seek(0)
-        return dfh
-
-head_df = read_head(head_source)
+        return read_csv(src, nrows=5)
+    # fichier importé : colonnes lues une fois sur les premiers octets
+    return pd.DataFrame(columns=src)
+
+if use_uploader:
+    # empreinte, en-tête et job en cours gardés en session par fichier importé : un seul hachage par import,
+    # et pas de nouveau job tant que le registre garde les agrégats
+    upload = st.session_state.get("import")
+    if upload is None or upload["file_id"] != uploaded.file_id:
+        with prof.stage("empreinte import"):
+            upload = {"file_id": uploaded.file_id, "digest": bytes_digest(uploaded.getvalue()),
+                      "header": None, "job": None}
+        st.session_state["import"] = upload
+    upload_digest = upload["digest"]
+    job = upload["job"] or uploads.get(upload_digest)  # chargement lancé par cette session ou une autre
+    if upload["header"] is None:
+        upload["header"] = (job.dialect, job.columns) if job is not None else read_upload_header(uploaded.getvalue())
+    head_source = upload["header"][1]
+
+with prof.stage("lecture en-tête"):
+    head_df = read_head(head_source)
 
 if DATE_COL not in head_df.columns:
     st.error(f"colonne {DATE_COL} absente")
-    st.stop()
+    stop()
 
 present_products = [c for c in KNOWN_PRODUCTS if c in head_df.columns]
 has_hour = "Hour" in head_df.columns
 
 usecols = [DATE_COL] + present_products + (["Hour"] if has_hour else [])
-dtype_map = {c: "float32" for c in present_products}
 
-# lecture optimisée
-@st.cache_data(show_spinner=True)
-def load_optimized_csv(path, uploaded, usecols, dtype_map, date_col, fast_mode, sample_threshold, sample_frac):
-    if uploaded is not None:
-        df = pd.read_csv(uploaded, usecols=[c for c in usecols if c], dtype=dtype_map)
+def source_key():
+    """Identifie le jeu chargé par son contenu (un même fichier réimporté n'est pas relu)."""
+    digest = upload_digest if use_uploader else file_digest(path)
+    return (digest, tuple(usecols), tuple(levels or ()) if not use_uploader else ())
+
+# agrégats exacts (heure, jour, semaine, mois, jour × heure) calculés une fois par jeu de données,
+# sans garder les lignes brutes ni échantillonner
+def build_rollups():
+    prof_build.built = True
+    chunks = iter_source_chunks(
+        path,
+        None,
+        usecols,
+        None,  # types du schéma (schema.py)
+        DATE_COL,
+        levels,
+        CHUNK_ROWS,
+    )
+    return Rollups.from_chunks(chunks, DATE_COL, present_products, "Hour" if has_hour else None)
+
+def build_upload():
+    """Agrégats du fichier importé : fin du job en cours (nouveau job si l'entrée a été évincée entre-temps)."""
+    return (job or UploadJob(uploaded.getvalue(), header=upload["header"]).start()).result()
+
+# fichier importé : lu une fois sur un thread de fond (upload.py) ; en attendant, kpi et graphiques
+# sont calculés sur les agrégats des morceaux déjà lus
+try:
+    with prof.stage("empreinte source"):
+        key = source_key()
+    if use_uploader and key not in registry:
+        if job is None:
+            job = UploadJob(uploaded.getvalue(), header=upload["header"])
+        job = upload["job"] = uploads.setdefault(upload_digest, job).start()  # sans effet si déjà lancé
+        loading = not job.done
+    if loading:
+        with prof.stage("agrégats (chargement en cours)") as prof_build:
+            rollups = job.snapshot()
+        fraction, rows = job.progress()
+        st.progress(fraction, text=f"{fraction:.0%} chargé · {rows:,} lignes agrégées".replace(",", " "))
+        if rollups is None:
+            stop()
     else:
-        df = pd.read_csv(path, usecols=[c for c in usecols if c], dtype=dtype_map)
-    df[date_col] = pd.to_datetime(df[date_col], errors="coerce", infer_datetime_format=True)
-    df = df.dropna(subset=[date_col])
-    if fast_mode and len(df) > sample_threshold:
-        df = df.sample(frac=sample_frac, random_state=42).sort_values(date_col)
-    return df
-
-df = load_optimized_csv(
-    path=path,
-    uploaded=uploaded if use_uploader else None,
-    usecols=usecols,
-    dtype_map=dtype_map,
-    date_col=DATE_COL,
-    fast_mode=FAST_MODE,
-    sample_threshold=SAMPLE_THRESHOLD,
-    sample_frac=SAMPLE_FRAC,
-)
+        try:
+            with st.spinner("Agrégation des données…"), prof.stage("agrégats (registre)") as prof_build:
+                rollups = registry.get_or_build(key, build_upload if use_uploader else build_rollups)
+        finally:
+            if use_uploader:
+                uploads.pop(upload_digest, None)
+        if use_uploader:
+            upload["job"] = None  # agrégats au registre ; un job en échec reste en session (erreur sans relecture)
+except AmbiguousDateFormat as e:
+    st.error(f"{DATE_COL} : {e}")
+    stop()
+except (ValueError, TypeError) as e:
+    # fichier importé : séparateur, colonne non numérique… (les sources locales sont déjà nettoyées)
+    if not use_uploader:
+        prof.close()
+        raise
+    st.error(f"Lecture du fichier importé impossible : {e}")
+    stop()
+
+with st.sidebar.expander("Cache des jeux de données"):
+    stats = registry.stats()
+    st.caption(
+        f"{stats['entrees']} jeu(x) · {stats['octets'] / 2**20:.1f} / {stats['budget'] / 2**20:.0f} Mo · "
+        f"hits {stats['hits']} · misses {stats['misses']} · évictions {stats['evictions']}"
+    )
 
 # dates disponibles et snapping
-available_dates = pd.to_datetime(df[DATE_COL].dt.date).sort_values().unique()
+available_dates = rollups.available_dates()
 if len(available_dates) == 0:
     st.error("aucune date valide")
-    st.stop()
+    stop()
+if rollups.undated:
+    st.warning(f"{rollups.undated:,} lignes ignorées : {DATE_COL} vide ou illisible".replace(",", " "))
 
 min_date = pd.to_datetime(available_dates[0]).date()
 max_date = pd.to_datetime(available_dates[-1]).date()
 
-def snap_range_to_available(d1, d2, avail_np):
-    if d1 > d2:
-        return None, None
-    d1d = np.datetime64(pd.to_datetime(d1).date())
-    d2d = np.datetime64(pd.to_datetime(d2).date())
-    i = avail_np.searchsorted(d1d, side="left")
-    j = avail_np.searchsorted(d2d, side="right") - 1
-    if i >= len(avail_np) or j < 0 or i > j:
-        return None, None
-    start_snap = pd.to_datetime(avail_np[i]).normalize()
-    end_snap_excl = pd.to_datetime(avail_np[j]).normalize() + pd.Timedelta(days=1)
-    return start_snap, end_snap_excl
-
 # filtres ui
 st.subheader("Filtres")
 c1, c2, c3 = st.columns([2, 2, 2])
@@ -115,7 +228,7 @@ with c1:
 
 if not selected_products:
     st.info("sélectionner au moins un produit")
-    st.stop()
+    stop()
 
 # filtre période
 with c2:
@@ -130,58 +243,33 @@ with c2:
         d1, d2 = date_selection
         if d1 is None or d2 is None:
             st.info("sélectionner deux dates début et fin")
-            st.stop()
+            stop()
         start_dt, end_dt = snap_range_to_available(d1, d2, available_dates)
         if start_dt is None or end_dt is None:
             st.info("la plage choisie ne contient aucune date disponible")
-            st.stop()
+            stop()
     else:
         st.info("sélectionner deux dates début et fin")
-        st.stop()
+        stop()
 
 # filtre granularité
 with c3:
     granularity = st.radio("Granularité", ["Heure", "Jour", "Semaine", "Mois"], horizontal=True)
-    rule_map = {"Heure": "H", "Jour": "D", "Semaine": "W-MON", "Mois": "MS"}
-    rule = rule_map[granularity]
-
-# application filtres
-base_cols = [DATE_COL] + selected_products + (["Hour"] if "Hour" in df.columns else [])
-mask_cur = (df[DATE_COL] >= start_dt) & (df[DATE_COL] < end_dt)
-df_cur = df.loc[mask_cur, base_cols].copy()
-
-# agrégation
-@st.cache_data(show_spinner=False)
-def resample_sum_wide(df_wide, date_col, rule):
-    if df_wide.empty:
-        return df_wide
-    return (
-        df_wide.set_index(date_col)
-               .sort_index()
-               .resample(rule)
-               .sum(min_count=1)
-               .reset_index()
-    )
+    rule = GRANULARITIES[granularity]
+
+# agrégation depuis la table pré-calculée la plus grossière qui couvre la plage
+with prof.stage("rééchantillonnage", granularite=rule) as stage:
+    cur_resampled = rollups.resampled(start_dt, end_dt, rule, selected_products)
+    stage.rows = len(cur_resampled)
 
-cur_resampled = resample_sum_wide(df_cur[[DATE_COL] + selected_products], DATE_COL, rule)
-
-# kpi
-def kpis_from_resampled(resampled):
-    if resampled.empty:
-        return 0.0, np.nan, "—", 0
-    prod_cols = [c for c in resampled.columns if c != DATE_COL]
-    total = resampled[prod_cols].sum().sum()
-    daily = resample_sum_wide(df_cur[[DATE_COL] + selected_products], DATE_COL, "D")
-    daily_total = daily[prod_cols].sum(axis=1) if not daily.empty else pd.Series(dtype="float32")
-    daily_avg = float(daily_total.mean()) if not daily_total.empty else np.nan
-    totals_by_prod = resampled[prod_cols].sum(axis=0).sort_values(ascending=False)
-    top_prod = totals_by_prod.index[0] if len(totals_by_prod) else "—"
-    n_points = len(resampled)
-    return float(total), daily_avg, top_prod, n_points
+# totaux de la plage par sommes cumulées (pas de parcours des lignes)
+with prof.stage("totaux de la plage"):
+    range_totals, range_days = rollups.totals(start_dt, end_dt, selected_products)
 
 st.markdown("---")
 st.header("Indicateurs clés")
-cur_total, cur_daily_avg, cur_top, n_points = kpis_from_resampled(cur_resampled)
+with prof.stage("kpi"):
+    cur_total, cur_daily_avg, cur_top, n_points = kpis_from_resampled(cur_resampled, range_totals, range_days)
 
 k1, k2, k3, k4 = st.columns(4)
 with k1:
@@ -213,32 +301,40 @@ def fmt_time(s, granularity):
         return ("S" + iso["week"].astype(str) + " " + iso["year"].astype(str))
     return s.dt.strftime("%Y-%m")
 
-line_df = to_long_total(cur_resampled)
-line_df["label"] = fmt_time(line_df[DATE_COL], granularity)
+# seuls les points envoyés aux graphiques sont réduits ; kpi et totaux restent sur toutes les cases
+max_points = point_budget(CHART_WIDTH_PX)
+
+with prof.stage("ligne : préparation") as stage:
+    line_df = to_long_total(cur_resampled)
+    if len(line_df) > max_points:
+        line_df = line_df.iloc[lttb_indices(line_df["value"].to_numpy(), max_points)]
+        st.caption(f"{len(line_df)} points affichés sur {len(cur_resampled)}")
+    line_df["label"] = fmt_time(line_df[DATE_COL], granularity)
+    stage.rows = len(line_df)
 
 line_chart = alt.Chart(line_df).mark_line().encode(
     x=alt.X("label:N", title="Temps", sort=None),
     y=alt.Y("value:Q", title="Quantité (g)"),
     tooltip=["label", alt.Tooltip("value:Q", title="Quantité (g)")]
 ).properties(height=320)
-st.altair_chart(line_chart, use_container_width=True)
+with prof.stage("ligne : sérialisation Altair"):
+    st.altair_chart(line_chart, use_container_width=True)
 
 # stacked area
 st.markdown("---")
 st.header("Contribution des produits")
 
 if not cur_resampled.empty:
-    prod_cols = [c for c in cur_resampled.columns if c != DATE_COL]
-    totals_by_prod = cur_resampled[prod_cols].sum(axis=0).sort_values(ascending=False)
-    topk = totals_by_prod.index[:TOPK_STACK].tolist()
-    others = [c for c in prod_cols if c not in topk]
-
-    area_df = cur_resampled[[DATE_COL] + topk].copy()
-    if others:
-        area_df["Autres"] = cur_resampled[others].sum(axis=1)
+    area_df = stack_frame(cur_resampled, range_totals, TOPK_STACK)
+    if len(area_df) > max_points:
+        # mêmes dates pour tous les produits : min / max du total par case
+        keep = minmax_indices(area_df.drop(columns=DATE_COL).sum(axis=1).to_numpy(), max_points)
+        area_df = area_df.iloc[keep]
 
-    area_long = area_df.melt(id_vars=[DATE_COL], var_name="product", value_name="value")
-    area_long["label"] = fmt_time(area_long[DATE_COL], granularity)
+    with prof.stage("aire : melt") as stage:
+        area_long = area_df.melt(id_vars=[DATE_COL], var_name="product", value_name="value")
+        area_long["label"] = fmt_time(area_long[DATE_COL], granularity)
+        stage.rows = len(area_long)
 
     stack_mode = st.radio("Mode de stack", ["Part relative", "Valeur absolue"], horizontal=True)
     y_enc = alt.Y(
@@ -253,7 +349,8 @@ if not cur_resampled.empty:
         color=alt.Color("product:N", title="Produit"),
         tooltip=["product", "label", alt.Tooltip("value:Q", title="Quantité (g)")]
     ).properties(height=320)
-    st.altair_chart(area_chart, use_container_width=True)
+    with prof.stage("aire : sérialisation Altair"):
+        st.altair_chart(area_chart, use_container_width=True)
 else:
     st.info("pas de données pour cette période")
 
@@ -262,24 +359,21 @@ st.markdown("---")
 st.header("Top et bottom produits")
 
 if not cur_resampled.empty:
-    prod_cols = [c for c in cur_resampled.columns if c != DATE_COL]
-    totals = cur_resampled[prod_cols].sum(axis=0).reset_index()
-    totals.columns = ["product", "Quantité (g)"]
-
     b1, b2 = st.columns([2, 1])
     with b1:
         mode_rank = st.radio("Classement", ["Top", "Bottom"], horizontal=True)
     with b2:
         n_rank = st.number_input("Nombre de produits affichés", 3, 50, 10, 1)
 
-    totals = totals.sort_values("Quantité (g)", ascending=(mode_rank == "Bottom")).head(int(n_rank))
+    totals = ranking(range_totals, bottom=(mode_rank == "Bottom"), n=n_rank)
 
     bar_chart = alt.Chart(totals).mark_bar().encode(
         x=alt.X("Quantité (g):Q", title="Quantité (g)"),
         y=alt.Y("product:N", sort="-x", title="Produit"),
         tooltip=["product", "Quantité (g)"]
     ).properties(height=max(250, 22 * len(totals)))
-    st.altair_chart(bar_chart, use_container_width=True)
+    with prof.stage("classement : sérialisation Altair"):
+        st.altair_chart(bar_chart, use_container_width=True)
 else:
     st.info("pas de données à agréger pour le classement")
 
@@ -287,30 +381,15 @@ else:
 st.markdown("---")
 st.header("Heatmap des pics")
 
-if "Hour" not in df_cur.columns:
+with prof.stage("heatmap : agrégation"):
+    heat_agg = heatmap_frame(rollups, start_dt, end_dt, selected_products)
+if heat_agg is None:
     st.info("heatmap indisponible colonne Hour absente")
 else:
-    cur_for_heat = df_cur.dropna(subset=["Hour"]).copy()
-    cur_for_heat["Heure"] = pd.to_numeric(cur_for_heat["Hour"], errors="coerce")
-    cur_for_heat = cur_for_heat[(cur_for_heat["Heure"] >= 0) & (cur_for_heat["Heure"] <= 23)]
-    cur_for_heat["Heure"] = cur_for_heat["Heure"].astype(int)
-
-    if cur_for_heat.empty:
+    if heat_agg.empty:
         st.info("aucune donnée horaire valide")
     else:
-        cur_for_heat["Jour"] = pd.to_datetime(cur_for_heat[DATE_COL]).dt.day_name(locale="fr_FR")
-        cur_for_heat["total"] = cur_for_heat[selected_products].sum(axis=1)
-        heat_agg = cur_for_heat.groupby(["Jour", "Heure"])["total"].sum().reset_index()
-        heat_agg.rename(columns={"total": "Quantité (g)"}, inplace=True)
-
-        ordre_jours = ["lundi", "mardi", "mercredi", "jeudi", "vendredi", "samedi", "dimanche"]
-        lower = heat_agg["Jour"].str.lower()
-        if set(ordre_jours).issubset(set(lower.unique())):
-            order_map = {j: i for i, j in enumerate(ordre_jours)}
-            heat_agg["_order"] = lower.map(order_map)
-            day_sort = heat_agg.sort_values("_order")["Jour"].drop_duplicates().tolist()
-        else:
-            day_sort = heat_agg["Jour"].dropna().unique().tolist()
+        day_sort = [j for j in JOURS if j in set(heat_agg["Jour"])]
 
         heatmap = alt.Chart(heat_agg).mark_rect().encode(
             x=alt.X("Heure:O", title="Heure"),
@@ -318,4 +397,35 @@ else:
             color=alt.Color("Quantité (g):Q", title="Quantité (g)"),
             tooltip=["Jour", "Heure", "Quantité (g)"]
         ).properties(height=260)
-        st.altair_chart(heatmap, use_container_width=True)
+        with prof.stage("heatmap : sérialisation Altair"):
+            st.altair_chart(heatmap, use_container_width=True)
+
+# panneau de profilage : étapes du passage, taux de cache, export de trace
+if prof.enabled:
+    traces = st.session_state.setdefault("profil_traces", [])
+    traces.append(prof.chrome_trace())
+    del traces[:-TRACE_RUNS]
+    with prof_panel:
+        st.caption(f"Passage complet : {(time.perf_counter() - run_start) * 1000:.0f} ms")
+        st.dataframe(prof.summary(), hide_index=True, use_container_width=True)
+        reg = registry.stats()
+        lookups = reg["hits"] + reg["misses"]
+        heat_info = rollups.heat.cache_info() if rollups.heat is not None else None
+        st.caption(
+            f"Registre : {reg['hits']}/{lookups} hits"
+            + (f" ({reg['hits'] / lookups:.0%})" if lookups else "")
+            + (" · agrégats recalculés" if getattr(prof_build, "built", False) else "")
+            + (f" · heatmap : {heat_info.hits}/{heat_info.hits + heat_info.misses} hits" if heat_info else "")
+        )
+        st.download_button(
+            f"Trace Chrome ({len(traces)} passages)",
+            data=json.dumps(merge_traces(traces)),
+            file_name="rush2_trace.json",
+            mime="application/json",
+        )
+
+# fin du passage ; import en cours : nouvel affichage avec les morceaux lus entre-temps
+prof.close()
+if loading:
+    time.sleep(REFRESH_S)
+    st.rerun()
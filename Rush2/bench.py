@@ -0,0 +1,258 @@
+# bench.py
+"""Banc de mesure du pipeline Rush2 : données synthétiques à l'échelle voulue, temps et pic mémoire
+de chaque étape (nettoyage, agrégats, requêtes du tableau de bord), résultats en JSON comparables.
+
+    python3 bench.py --scale 10 --out bench_10x.json
+    python3 bench.py --scale 10 --out apres.json --compare bench_10x.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE))
+
+from columns import MappedColumns  # noqa: E402
+from downsample import lttb_indices, point_budget  # noqa: E402
+from query import iter_source_chunks  # noqa: E402
+from rollups import Rollups  # noqa: E402
+from store import HAS_ARROW, iter_store  # noqa: E402
+
+PRODUCTS = ["M01AB", "M01AE", "N02BA", "N02BE", "N05B", "N05C", "R03", "R06"]
+BASE_HOURLY_ROWS = 50_532  # lignes du Pharma_Ventes_Hourly.csv livré
+HOURS_OPEN = range(8, 22)  # heures d'ouverture simulées
+REGRESSION = 1.10  # au-delà de +10 % sur la médiane, l'étape est signalée…
+MIN_DELTA = 0.001  # … si l'écart dépasse aussi 1 ms (bruit de mesure en dessous)
+MIN_SAMPLE = 0.05  # une mesure enchaîne assez d'appels pour durer au moins 50 ms
+
+
+# === Données synthétiques ===
+
+def _values(rng, n: int, n_products: int, scale: float) -> np.ndarray:
+    # quantités positives, arrondies à 2 décimales comme les exports
+    return np.round(rng.gamma(0.6, scale, size=(n, n_products)), 2)
+
+
+def _us_dates(stamps: pd.DatetimeIndex, with_time: bool) -> pd.Index:
+    # format des exports livrés, sans zéros de tête : 1/2/2014 8:00
+    text = stamps.month.astype(str) + "/" + stamps.day.astype(str) + "/" + stamps.year.astype(str)
+    if with_time:
+        text = text + " " + stamps.hour.astype(str) + ":" + pd.Index(stamps.minute).map("{:02d}".format)
+    return text
+
+
+def generate(out: Path, scale: int = 1, years: int = 6, extra_products: int = 0, seed: int = 0) -> dict:
+    """Écrit Pharma_Ventes_{Hourly,Daily,Weekly,Monthly}.csv dans out, au format des sources livrées.
+
+    scale multiplie les lignes horaires du fichier livré : à partir de 2x, plusieurs ventes
+    par heure (minutes différentes), sur `years` années.
+    """
+    out.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    products = PRODUCTS + [f"P{i:02d}" for i in range(1, extra_products + 1)]
+    start = pd.Timestamp("2014-01-02")
+    days = pd.date_range(start, start + pd.DateOffset(years=years), freq="D", inclusive="left")
+    per_hour = max(1, round(BASE_HOURLY_ROWS * scale / (len(days) * len(HOURS_OPEN))))
+
+    hourly_path = out / "Pharma_Ventes_Hourly.csv"
+    rows = 0
+    with open(hourly_path, "w", encoding="utf-8", newline="") as f:
+        header = True
+        for block in np.array_split(days, max(1, len(days) // 30)):
+            offsets = (np.array(HOURS_OPEN)[:, None] * 60 + (60 * np.arange(per_hour)) // per_hour).ravel()
+            stamps = pd.DatetimeIndex(
+                (block.to_numpy()[:, None] + offsets.astype("timedelta64[m]")[None, :]).ravel()
+            )
+            df = pd.DataFrame(_values(rng, len(stamps), len(products), 0.6), columns=products)
+            df.insert(0, "datum", _us_dates(stamps, with_time=True))
+            df["Year"] = stamps.year
+            df["Month"] = stamps.month
+            df["Hour"] = stamps.hour
+            df["Weekday Name"] = stamps.day_name()
+            f.write(df.to_csv(index=False, header=header))
+            header = False
+            rows += len(df)
+
+    daily = pd.DataFrame(_values(rng, len(days), len(products), 8 * per_hour), columns=products)
+    daily.insert(0, "datum", _us_dates(days, with_time=False))
+    daily["Year"], daily["Month"] = days.year, days.month
+    daily["Hour"] = rng.integers(150, 300, len(days))
+    daily["Weekday Name"] = days.day_name()
+    daily.to_csv(out / "Pharma_Ventes_Daily.csv", index=False)
+
+    weeks = pd.date_range(days[0], days[-1], freq="W-SUN")
+    weekly = pd.DataFrame(_values(rng, len(weeks), len(products), 50 * per_hour), columns=products)
+    weekly.insert(0, "datum", _us_dates(weeks, with_time=False))
+    weekly.to_csv(out / "Pharma_Ventes_Weekly.csv", index=False)
+
+    months = pd.date_range(days[0], days[-1], freq="ME")
+    monthly = pd.DataFrame(_values(rng, len(months), len(products), 200 * per_hour), columns=products)
+    monthly.insert(0, "datum", months.strftime("%Y-%m-%d"))
+    monthly.to_csv(out / "Pharma_Ventes_Monthly.csv", index=False)
+    return {"hourly_rows": rows, "days": len(days), "products": len(products), "per_hour": per_hour}
+
+
+# === Mesures ===
+
+def measure(fn, repeat: int = 3, memory: bool = True) -> dict:
+    """Temps par appel sur repeat mesures (sans traçage), puis un appel sous tracemalloc pour le pic mémoire.
+
+    Les étapes courtes sont enchaînées `number` fois par mesure (comme timeit) pour sortir du bruit.
+    """
+    t0 = time.perf_counter()
+    result = fn()
+    first = time.perf_counter() - t0
+    number = max(1, int(MIN_SAMPLE / first)) if first > 0 else 1
+    seconds = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            result = fn()
+        seconds.append((time.perf_counter() - t0) / number)
+    stats = {"number": number,
+             "seconds": [round(s, 6) for s in seconds],
+             "min": round(min(seconds), 6),
+             "median": round(statistics.median(seconds), 6)}
+    if memory:
+        tracemalloc.start()
+        fn()
+        stats["peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+        tracemalloc.stop()
+    return stats, result
+
+
+def run(data: Path, repeat: int, memory: bool, jobs: int, chunksize, chunk_rows: int) -> dict:
+    stages = {}
+
+    def record(name, fn, n=repeat):
+        stats, result = measure(fn, n, memory)
+        stages[name] = stats
+        print(f"{name:<28} médiane {stats['median']:>9.4f} s" + (f" | pic {stats['peak_mb']:>8.1f} Mo" if memory else ""))
+        return result
+
+    # pipeline de nettoyage (le module lit ses chemins relatifs au répertoire courant)
+    cwd = Path.cwd()
+    os.chdir(data)
+    try:
+        import datacleaner
+        quiet = lambda f: (lambda: _silent(f))  # noqa: E731
+        record("cleaner.full", quiet(lambda: datacleaner.main(full=True, chunksize=chunksize, jobs=jobs)))
+        record("cleaner.unchanged", quiet(lambda: datacleaner.main(chunksize=chunksize, jobs=jobs)))
+    finally:
+        os.chdir(cwd)
+
+    consolidated = data / "pharma_consolidated_full.csv"
+    usecols = ["datum", "Hour"] + PRODUCTS
+    rollups = record("rollups.from_csv",
+                     lambda: Rollups.from_chunks(iter_source_chunks(
+                         consolidated, usecols=usecols, chunk_rows=chunk_rows),
+                         "datum", PRODUCTS, "Hour"))
+    columns_dir = data / "pharma_columns"
+    record("rollups.from_columns", lambda: Rollups.from_chunks(
+        MappedColumns(columns_dir).iter_frames(columns=usecols, batch_rows=chunk_rows), "datum", PRODUCTS, "Hour"))
+    if HAS_ARROW and (data / "pharma_store").is_dir():
+        record("rollups.from_store", lambda: Rollups.from_chunks(
+            iter_store(data / "pharma_store", columns=usecols, batch_rows=chunk_rows), "datum", PRODUCTS, "Hour"))
+
+    # requêtes du tableau de bord : toute la période, puis une année au milieu
+    days = rollups.available_dates()
+    full = (pd.Timestamp(days[0]), pd.Timestamp(days[-1]) + pd.Timedelta(days=1))
+    mid = pd.Timestamp(days[len(days) // 2]).normalize()
+    year = (mid, mid + pd.DateOffset(years=1))
+    some = PRODUCTS[:3]
+    for label, (a, b) in (("full", full), ("year", year)):
+        for rule in ("h", "D", "W-MON", "MS"):
+            record(f"query.resampled.{rule}.{label}", lambda: rollups.resampled(a, b, rule, PRODUCTS))
+        record(f"query.totals.{label}", lambda: rollups.totals(a, b, PRODUCTS))
+        record(f"query.heatmap.{label}.cold", lambda: (rollups.heat.cache_clear(),
+                                                    rollups.heatmap(a, b, PRODUCTS)))
+        record(f"query.heatmap.{label}.warm", lambda: rollups.heatmap(a, b, some))
+    hourly_total = rollups.resampled(*full, "h", PRODUCTS)[PRODUCTS].sum(axis=1).to_numpy()
+    record("chart.lttb.hourly", lambda: lttb_indices(hourly_total, point_budget(1400)))
+    return stages
+
+
+def _silent(fn):
+    # le rapport du nettoyage n'a pas sa place dans la sortie du banc
+    import contextlib
+    import io
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn()
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def compare(current: dict, baseline: dict) -> list:
+    """Rapport médiane actuelle / médiane de référence, étape par étape."""
+    lines = []
+    if current["params"] != baseline.get("params"):
+        lines.append("Attention : paramètres différents de la référence, comparaison indicative.")
+    for name, stats in current["stages"].items():
+        ref = baseline["stages"].get(name)
+        if ref is None:
+            lines.append(f"{name:<28} nouvelle étape")
+            continue
+        ratio = stats["median"] / ref["median"] if ref["median"] else float("inf")
+        slower = ratio > REGRESSION and stats["median"] - ref["median"] > MIN_DELTA
+        flag = "  ⚠ régression" if slower else ""
+        lines.append(f"{name:<28} {ref['median']:>9.4f} s → {stats['median']:>9.4f} s  (x{ratio:.2f}){flag}")
+    return lines
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Banc de mesure du pipeline Rush2.")
+    parser.add_argument("--scale", type=int, default=1, help="multiple du fichier horaire livré (1, 10, 100…)")
+    parser.add_argument("--years", type=int, default=6, help="années couvertes par les données synthétiques")
+    parser.add_argument("--extra-products", type=int, default=0, help="colonnes produit supplémentaires (P01…)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data", type=Path, default=HERE / "bench_data", help="répertoire des données générées")
+    parser.add_argument("--repeat", type=int, default=3, help="nombre de mesures par étape")
+    parser.add_argument("--no-memory", action="store_true", help="sans passage tracemalloc (plus rapide)")
+    parser.add_argument("--jobs", type=int, default=1)
+    parser.add_argument("--chunksize", type=int, default=None)
+    parser.add_argument("--chunk-rows", type=int, default=500_000, help="lignes par morceau côté app")
+    parser.add_argument("--out", type=Path, default=None, help="fichier JSON des résultats")
+    parser.add_argument("--compare", type=Path, default=None, help="JSON de référence à comparer")
+    args = parser.parse_args()
+
+    data = args.data / f"x{args.scale}"
+    params = {"scale": args.scale, "years": args.years, "extra_products": args.extra_products,
+              "seed": args.seed, "repeat": args.repeat, "jobs": args.jobs, "chunksize": args.chunksize,
+              "chunk_rows": args.chunk_rows}
+    print(f"Génération des données synthétiques dans {data}/")
+    dataset = generate(data, args.scale, args.years, args.extra_products, args.seed)
+    print(f"{dataset['hourly_rows']} lignes horaires, {dataset['days']} jours, {dataset['products']} produits\n")
+
+    stages = run(data.resolve(), args.repeat, not args.no_memory, args.jobs, args.chunksize, args.chunk_rows)
+    results = {"params": params, "dataset": dataset, "environment": environment(), "stages": stages}
+    if args.out:
+        args.out.write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"\nRésultats : {args.out}")
+    if args.compare:
+        print("\n=== Comparaison ===")
+        print("\n".join(compare(results, json.loads(args.compare.read_text(encoding="utf-8")))))
@@ -0,0 +1,131 @@
+# columns.py
+"""Colonnes binaires triées par datum, ouvertes par memmap : datum en int64 (ns), un float32 par produit.
+
+Les processus de l'app partagent les pages via le cache du système ; une plage de dates
+se lit comme une vue, sans copie.
+"""
+import json
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+META = "meta.json"
+LEVEL_COL = "granularite"
+HOUR_COL = "Hour"
+SORT_BLOCK = 1 << 22  # lignes recopiées à la fois pendant le tri
+
+
+def _col_file(root: Path, name: str) -> Path:
+    return Path(root) / f"{name}.bin"
+
+
+def write_columns(chunks, root: Path, date_col: str, products: list) -> int:
+    """Écrit les morceaux (lignes nettoyées) en colonnes binaires triées par datum ; renvoie le nombre de lignes.
+
+    Les morceaux sont d'abord ajoutés tels quels, puis recopiés dans l'ordre des dates
+    colonne par colonne : la mémoire dépend d'une colonne, pas du fichier entier.
+    """
+    root = Path(root)
+    tmp = root.with_name(root.name + ".tmp")
+    raw = tmp / "raw"
+    if tmp.exists():
+        shutil.rmtree(tmp)
+    raw.mkdir(parents=True)
+
+    dtypes = {date_col: "int64", LEVEL_COL: "uint8", HOUR_COL: "float32", **{p: "float32" for p in products}}
+    files = {name: open(_col_file(raw, name), "wb") for name in dtypes}
+    levels, rows = [], 0
+    try:
+        for chunk in chunks:
+            dates = pd.to_datetime(chunk[date_col], errors="coerce", format="ISO8601")
+            keep = dates.notna().to_numpy()
+            if not keep.any():
+                continue
+            rows += int(keep.sum())
+            files[date_col].write(dates.to_numpy(dtype="datetime64[ns]")[keep].view("int64").tobytes())
+            level = chunk[LEVEL_COL].astype(str) if LEVEL_COL in chunk.columns else pd.Series("", index=chunk.index)
+            for name in level.unique():
+                if name not in levels:
+                    levels.append(name)
+            codes = level.map({name: i for i, name in enumerate(levels)}).to_numpy(dtype="uint8")
+            files[LEVEL_COL].write(codes[keep].tobytes())
+            for name in [HOUR_COL] + products:
+                if name in chunk.columns:
+                    values = pd.to_numeric(chunk[name], errors="coerce").to_numpy(dtype="float32")
+                else:
+                    values = np.full(len(chunk), np.nan, dtype="float32")
+                files[name].write(values[keep].tobytes())
+    finally:
+        for f in files.values():
+            f.close()
+
+    # tri stable : à date égale, l'ordre des niveaux du consolidé est conservé
+    order = np.argsort(np.fromfile(_col_file(raw, date_col), dtype="int64"), kind="stable")
+    for name, dtype in dtypes.items():
+        src = np.memmap(_col_file(raw, name), dtype=dtype, mode="r") if rows else np.empty(0, dtype)
+        out = np.lib.format.open_memmap(tmp / f"{name}.npy", mode="w+", dtype=dtype, shape=(rows,))
+        for i in range(0, rows, SORT_BLOCK):
+            out[i:i + SORT_BLOCK] = src[order[i:i + SORT_BLOCK]]
+        out.flush()
+        del src, out
+    shutil.rmtree(raw)
+    meta = {"rows": rows, "date_col": date_col, "products": products, "levels": levels, "dtypes": dtypes}
+    (tmp / META).write_text(json.dumps(meta, indent=2), encoding="utf-8")
+
+    if root.exists():
+        shutil.rmtree(root)
+    tmp.rename(root)
+    return rows
+
+
+def columns_exist(root: Path) -> bool:
+    return (Path(root) / META).is_file()
+
+
+class MappedColumns:
+    """Colonnes ouvertes en lecture seule par memmap (rien n'est lu avant d'être touché)."""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.meta = json.loads((self.root / META).read_text(encoding="utf-8"))
+        self.date_col = self.meta["date_col"]
+        self.levels = self.meta["levels"]
+        self.arrays = {
+            name: np.load(self.root / f"{name}.npy", mmap_mode="r") for name in self.meta["dtypes"]
+        }
+        # datum relu comme datetime64 sans copie
+        self.dates = self.arrays[self.date_col].view("datetime64[ns]")
+
+    @property
+    def columns(self) -> list:
+        names = [self.date_col, LEVEL_COL, HOUR_COL] + self.meta["products"]
+        return [n for n in names if n in self.arrays]
+
+    def bounds(self, start=None, end=None):
+        """Indices [i, j) des lignes de [start, end) : deux recherches binaires sur datum trié."""
+        i = 0 if start is None else int(self.dates.searchsorted(np.datetime64(pd.Timestamp(start), "ns")))
+        j = len(self.dates) if end is None else int(self.dates.searchsorted(np.datetime64(pd.Timestamp(end), "ns")))
+        return i, j
+
+    def frame(self, i: int, j: int, columns=None, levels=None) -> pd.DataFrame:
+        """Lignes [i, j) ; les tableaux sont des vues du memmap tant qu'aucun filtre de niveau n'est demandé."""
+        columns = [c for c in (columns or self.columns) if c in self.arrays or c == LEVEL_COL]
+        data = {}
+        for c in columns:
+            if c == self.date_col:
+                data[c] = self.dates[i:j]
+            elif c == LEVEL_COL:
+                data[c] = pd.Categorical.from_codes(self.arrays[c][i:j].astype("int8"), self.levels)
+            else:
+                data[c] = self.arrays[c][i:j]
+        df = pd.DataFrame(data, copy=False)
+        if levels is not None and set(levels) != set(self.levels):
+            codes = [self.levels.index(name) for name in levels if name in self.levels]
+            df = df[np.isin(self.arrays[LEVEL_COL][i:j], codes)]
+        return df
+
+    def iter_frames(self, columns=None, levels=None, batch_rows: int = 500_000):
+        for i in range(0, len(self.dates), batch_rows):
+            yield self.frame(i, min(i + batch_rows, len(self.dates)), columns, levels)
@@ -1,5 +1,22 @@
+import argparse
+import hashlib
+import io
+import json
+import shutil
+import time
+
 import pandas as pd
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+import rootpath  # noqa: F401  (ingest.py, à la racine du dépôt)
+from ingest import read_header, sniff, split_ranges
+
+from dates import AmbiguousDateFormat, detect_format, parse_dates
+from store import write_store
+from schema import apply_schema
+from profiling import Profiler, write_trace
+from columns import LEVEL_COL, HOUR_COL, columns_exist, write_columns
 
 # Dossier où se trouvent les fichiers CSV bruts
 BASE = Path(".")
@@ -20,15 +37,13 @@ OUT = {
     "Monthly": BASE / "clean_monthly_full.csv",
     "All": BASE / "pharma_consolidated_full.csv",
 }
-
-# Étape 1 : détecter toutes les colonnes existantes dans les fichiers
-all_columns = set()
-for p in SRC.values():
-    df_tmp = pd.read_csv(p, sep=None, engine="python", nrows=5)
-    all_columns.update(df_tmp.columns)
-# On force la présence de datum et granularite
-all_columns.update(["datum", "granularite"])
-all_columns = list(all_columns)
+# Stockage colonnaire partitionné (granularite=.../annee=...)
+STORE = BASE / "pharma_store"
+# Colonnes binaires triées par datum, ouvertes par memmap dans l'app
+COLUMNS_DIR = BASE / "pharma_columns"
+COLUMNS_CHUNK_ROWS = 500_000
+# Empreintes des sources au dernier passage (taille, mtime, sha256, lignes)
+MANIFEST = BASE / ".datacleaner_manifest.json"
 
 # === Réorganisation manuelle des colonnes (ordre prioritaire) ===
 preferred_order = [
@@ -47,73 +62,387 @@ preferred_order = [
     "R03",
     "R06",
 ]
-# Colonnes restantes détectées automatiquement mais non listées ci-dessus
-remaining = [c for c in all_columns if c not in preferred_order]
-# Nouvel ordre final
-all_columns = preferred_order + remaining
+PRODUCTS = preferred_order[6:]
+
+# Formats de date imposés par niveau (sinon détectés sur un échantillon de chaque source)
+DATE_FORMATS = {}
+DATE_SAMPLE_ROWS = 5000
+
+# Mode parallèle : taille visée des tranches d'une source confiées à un processus
+PIECE_BYTES = 16 * 1024 * 1024
+
+# Format de datum en sortie : le consolidé mélange heures et jours
+DATE_FMT_FULL = "%Y-%m-%d %H:%M:%S"
+DATE_FMT_DAY = "%Y-%m-%d"
+DATE_FMT_OUT = {"Hourly": DATE_FMT_FULL}
 
 # Fonctions utilitaires
-def read_csv_auto(p: Path) -> pd.DataFrame:
-    return pd.read_csv(p, sep=None, engine="python")
-
-def to_datetime_robust(series: pd.Series, monthly: bool = False) -> pd.Series:
-    """Conversion robuste de 'datum' en datetime."""
-    if monthly:
-        s = pd.to_datetime(series, errors="coerce")
-        if s.isna().any():
-            s = pd.to_datetime(series, errors="coerce", dayfirst=True)
-        return s
-    else:
-        s = pd.to_datetime(series, errors="coerce", dayfirst=True)
-        if s.isna().any():
-            s2 = pd.to_datetime(series, errors="coerce")
-            s = s.fillna(s2)
-        return s
-
-def clean_with_all_columns(df: pd.DataFrame, level: str, all_cols: list) -> pd.DataFrame:
-    """Nettoyage qui conserve toutes les colonnes globales dans l'ordre souhaité."""
-    df = df.copy()
-    monthly = (level == "Monthly")
+def sniff_header(p: Path):
+    """Colonnes et séparateur, d'après le dialecte détecté par ingest.py (en cache tant que la source ne change pas)."""
+    return read_header(p), sniff(p).sep
+
+def source_options(p: Path, sep: str) -> dict:
+    """Options de lecture d'une source : dialecte détecté, séparateur du manifeste."""
+    return {**sniff(p).read_kwargs(), "sep": sep, "engine": "c"}
+
+def read_csv_auto(p: Path, sep: str = ",", chunksize=None):
+    """Lecture de la source entière, ou itérateur de blocs de chunksize lignes."""
+    # produits lus directement en float32 (schema.py) ; le reste est typé par clean_with_all_columns
+    reader = pd.read_csv(p, dtype={c: "float32" for c in PRODUCTS}, float_precision="round_trip",
+                         chunksize=chunksize, **source_options(p, sep))
+    return [reader] if chunksize is None else reader
+
+def detect_columns(headers: list) -> list:
+    """Union des colonnes des sources, dans l'ordre prioritaire puis d'apparition."""
+    all_columns = []
+    for cols in headers:
+        all_columns += [c for c in cols if c not in all_columns]
+    # Colonnes restantes détectées automatiquement mais non listées ci-dessus
+    remaining = [c for c in all_columns if c not in preferred_order]
+    return preferred_order + remaining
+
+def clean_with_all_columns(df: pd.DataFrame, level: str, all_cols: list, date_format=None) -> pd.DataFrame:
+    """Nettoyage qui conserve toutes les colonnes globales dans l'ordre souhaité.
+
+    date_format : format détecté une fois pour toute la source (voir sample_date_format).
+    """
+    cols = dict(df.items())
     if 'datum' in df.columns:
-        df['datum'] = to_datetime_robust(df['datum'], monthly=monthly)
+        cols['datum'] = parse_dates(df['datum'], date_format)
     else:
-        df['datum'] = pd.NaT
-    df['granularite'] = level
-    # Crée les colonnes manquantes
-    for col in all_cols:
-        if col not in df.columns:
-            df[col] = pd.NA
-    # Réordonne selon all_cols
-    df = df[all_cols]
-    return df
-
-# Étape 2 : nettoyage des fichiers
-dfs_clean = {}
-report = []
-
-for level, path in SRC.items():
-    raw = read_csv_auto(path)
-    clean = clean_with_all_columns(raw, level, all_columns)
-    dfs_clean[level] = clean
-    clean.to_csv(OUT[level], index=False)
-    report.append({
-        "Fichier": path.name,
-        "Granularite": level,
-        "Lignes": clean.shape[0],
-        "Colonnes": clean.shape[1],
-        "Dates min": str(clean['datum'].min()),
-        "Dates max": str(clean['datum'].max())
-    })
-
-# Étape 3 : consolidation dans un fichier unique
-df_all = pd.concat(list(dfs_clean.values()), ignore_index=True)
-df_all.to_csv(OUT["All"], index=False)
-
-# Étape 4 : rapport
-print("\n=== Rapport de nettoyage ===")
-for r in report:
-    print(f"{r['Fichier']:<30} | {r['Granularite']:<8} | Lignes: {r['Lignes']:<6} | Colonnes: {r['Colonnes']:<3} | Dates: {r['Dates min']} → {r['Dates max']}")
-
-print("\n=== Fichiers générés ===")
-for k, p in OUT.items():
-    print(f"- {k}: {p}")
+        cols['datum'] = pd.NaT
+    cols['granularite'] = level
+    # Construit le bloc final en une fois : colonnes manquantes à NA, ordre de all_cols,
+    # puis types compacts (catégories, Int16 / Int8, float32) communs à toutes les sorties
+    return apply_schema(pd.DataFrame({col: cols.get(col, pd.NA) for col in all_cols}, index=df.index))
+
+# === Manifeste : empreintes des sources ===
+def load_manifest(path: Path) -> dict:
+    if not path.exists():
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def save_manifest(path: Path, manifest: dict) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+
+def fingerprint(p: Path, prefix_size: int = 0) -> dict:
+    """Taille, mtime et sha256 du fichier ; sha256 des prefix_size premiers octets en un seul passage."""
+    st_ = p.stat()
+    h = hashlib.sha256()
+    prefix_hash = None
+    done = 0
+    with open(p, "rb") as f:
+        if prefix_size:
+            while done < prefix_size:
+                buf = f.read(min(1 << 20, prefix_size - done))
+                if not buf:
+                    break
+                h.update(buf)
+                done += len(buf)
+            prefix_hash = h.copy().hexdigest()
+        for buf in iter(lambda: f.read(1 << 20), b""):
+            h.update(buf)
+    return {"size": st_.st_size, "mtime": st_.st_mtime, "sha256": h.hexdigest(), "prefix_sha256": prefix_hash}
+
+def ends_with_newline(p: Path, offset: int) -> bool:
+    if offset == 0:
+        return False
+    with open(p, "rb") as f:
+        f.seek(offset - 1)
+        return f.read(1) == b"\n"
+
+def source_status(p: Path, entry: dict):
+    """Compare la source à son entrée du manifeste : 'inchangé', 'ajout' ou 'complet'."""
+    if not entry:
+        return "complet", fingerprint(p)
+    st_ = p.stat()
+    if st_.st_size == entry["size"] and st_.st_mtime == entry["mtime"]:
+        return "inchangé", {"size": entry["size"], "mtime": entry["mtime"], "sha256": entry["sha256"]}
+    fp = fingerprint(p, prefix_size=entry["size"] if st_.st_size > entry["size"] else 0)
+    if fp["sha256"] == entry["sha256"]:
+        return "inchangé", fp
+    if fp["prefix_sha256"] == entry["sha256"] and ends_with_newline(p, entry["size"]):
+        return "ajout", fp
+    return "complet", fp
+
+def read_new_rows(p: Path, offset: int, columns: list, sep: str, chunksize=None):
+    """Lit uniquement les lignes ajoutées après l'octet offset."""
+    with open(p, "rb") as f:
+        f.seek(offset)
+        reader = pd.read_csv(f, header=None, names=columns, chunksize=chunksize, **source_options(p, sep),
+                             dtype={c: "float32" for c in PRODUCTS if c in columns}, float_precision="round_trip")
+        yield from ([reader] if chunksize is None else reader)
+
+def read_clean_output(level: str, src_columns: list, chunksize=None):
+    """Relit une sortie déjà nettoyée avec les mêmes types qu'après clean_with_all_columns."""
+    reader = pd.read_csv(OUT[level], dtype={c: "float32" for c in PRODUCTS}, float_precision="round_trip",
+                         chunksize=chunksize)
+    for df in ([reader] if chunksize is None else reader):
+        df["datum"] = parse_dates(df["datum"], DATE_FMT_OUT.get(level, DATE_FMT_DAY))
+        for col in df.columns:
+            if col not in src_columns and col not in ("datum", "granularite"):
+                df[col] = pd.NA
+        yield apply_schema(df)
+
+
+# === Blocs : le même code sert au mode séquentiel et aux processus du pool ===
+def render_piece(clean: pd.DataFrame, level: str, tag: str, store_root=None, level_csv: bool = True) -> dict:
+    """Bloc nettoyé → textes CSV (sortie du niveau, consolidé), statistiques et part du store."""
+    store_ok = write_store(clean, store_root, basename=tag, overwrite=False) if store_root is not None else None
+    return {
+        "level_csv": clean.to_csv(index=False, header=False, date_format=DATE_FMT_OUT.get(level, DATE_FMT_DAY))
+                     if level_csv else None,
+        "all_csv": clean.to_csv(index=False, header=False, date_format=DATE_FMT_FULL),
+        "rows": clean.shape[0],
+        "nat": int(clean["datum"].isna().sum()),
+        "min": clean["datum"].min(),
+        "max": clean["datum"].max(),
+        "store_ok": store_ok,
+    }
+
+def header_end(p: Path) -> int:
+    with open(p, "rb") as f:
+        f.readline()
+        return f.tell()
+
+def clean_range(task: dict) -> dict:
+    """Tâche d'un processus du pool : lit et nettoie les octets [start, end) d'une source."""
+    with open(task["path"], "rb") as f:
+        f.seek(task["start"])
+        data = f.read(task["end"] - task["start"])
+    raw = pd.read_csv(io.BytesIO(data), **task["options"], header=None, names=task["columns"],
+                      dtype={c: "float32" for c in PRODUCTS if c in task["columns"]}, float_precision="round_trip")
+    clean = clean_with_all_columns(raw, task["level"], task["all_columns"], task["date_format"])
+    return render_piece(clean, task["level"], task["tag"], task["store_root"])
+
+def sample_date_format(p: Path, offset: int, columns: list, sep: str):
+    """Format de datum détecté une fois par source, sur les premières lignes à partir de offset."""
+    if "datum" not in columns:
+        return None
+    head = next(read_new_rows(p, offset, columns, sep, chunksize=DATE_SAMPLE_ROWS), None)
+    return None if head is None else detect_format(head["datum"])
+
+
+def main(full: bool = False, chunksize=None, jobs: int = 1, date_formats_forced=None,
+         profile=None, profile_memory: bool = False) -> None:
+    """chunksize : nombre de lignes par bloc ; la mémoire dépend du bloc et non de la taille des fichiers.
+    jobs : nombre de processus ; les niveaux et les tranches des gros fichiers sont nettoyés en parallèle.
+    date_formats_forced : {niveau: format strptime}, prioritaire sur DATE_FORMATS et la détection.
+    profile : fichier de trace (format Trace Event) des étapes ; None = pas de chronométrage.
+    """
+    with Profiler(enabled=profile is not None, memory=profile_memory, name="datacleaner") as prof:
+        with prof.stage("datacleaner"):
+            clean_all(full, chunksize, jobs, date_formats_forced, prof)
+    if profile is not None:
+        write_trace(prof.chrome_trace(), profile)
+        print("\n=== Profil ===")
+        print(prof.summary().to_string(index=False))
+        print(f"- Trace: {profile}")
+
+
+def clean_all(full: bool, chunksize, jobs: int, date_formats_forced, prof: Profiler) -> None:
+    date_formats_forced = {**DATE_FORMATS, **(date_formats_forced or {})}
+    manifest = {} if full else load_manifest(MANIFEST)
+    outputs_ok = all(p.exists() for p in OUT.values())
+    sources = manifest.get("sources", {}) if outputs_ok else {}
+
+    # Étape 1 : empreintes des sources et colonnes (en-tête lu une seule fois)
+    status, fps, headers = {}, {}, {}
+    for level, path in SRC.items():
+        entry = sources.get(level, {})
+        with prof.stage("empreinte", niveau=level):
+            status[level], fps[level] = source_status(path, entry)
+        if status[level] == "complet":
+            headers[level] = sniff_header(path)
+        else:
+            headers[level] = (entry["columns"], entry["sep"])
+    # On force la présence de datum et granularite
+    all_columns = detect_columns([cols for cols, _ in headers.values()] + [["datum", "granularite"]])
+    if all_columns != manifest.get("all_columns"):
+        # schéma de sortie modifié : toutes les sorties sont à refaire
+        status = {level: "complet" for level in SRC}
+        sources = {}
+
+    # Format de datum : imposé, repris du manifeste pour un ajout, sinon détecté sur un échantillon
+    date_formats, errors = {}, []
+    for level, path in SRC.items():
+        columns, sep = headers[level]
+        entry = sources.get(level, {})
+        if level in date_formats_forced:
+            date_formats[level] = date_formats_forced[level]
+        elif status[level] == "inchangé" or (status[level] == "ajout" and "date_format" in entry):
+            date_formats[level] = entry.get("date_format")
+        else:
+            start = header_end(path) if status[level] == "complet" else entry["size"]
+            try:
+                with prof.stage("détection du format de date", niveau=level):
+                    date_formats[level] = sample_date_format(path, start, columns, sep)
+            except AmbiguousDateFormat as e:
+                errors.append(f"{path.name} : {e}")
+                continue
+            if date_formats[level] is None and "datum" in columns:
+                print(f"Attention : aucun format de date reconnu pour {path.name}, conversion au cas par cas")
+    if errors:
+        # on ne devine pas : l'utilisateur fixe le format avec --date-format NIVEAU=FORMAT
+        raise SystemExit("\n".join(errors + ["Préciser le format avec --date-format NIVEAU=FORMAT."]))
+
+    # Étape 2 : nettoyage des fichiers (complet ou lignes ajoutées seulement), bloc par bloc
+    # Étape 3 : chaque bloc part aussitôt vers le consolidé et le store, dans l'ordre de SRC
+    rebuild = any(st_ == "complet" for st_ in status.values())
+    if rebuild and STORE.exists():
+        shutil.rmtree(STORE)
+    store_root = STORE if (rebuild or STORE.exists()) else None
+    run_id = time.time_ns()
+
+    # Mode parallèle : toutes les tranches de tous les niveaux partent tout de suite dans le pool,
+    # les résultats sont relus dans l'ordre de SRC puis des tranches (sortie identique au séquentiel)
+    pool = ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else None
+    pending = {}
+    if pool is not None:
+        for level, path in SRC.items():
+            if status[level] == "inchangé":
+                continue
+            columns, sep = headers[level]
+            entry = sources.get(level, {})
+            start = header_end(path) if status[level] == "complet" else entry["size"]
+            if chunksize:
+                # tranches d'environ chunksize lignes, d'après la longueur moyenne d'une ligne
+                with open(path, "rb") as f:
+                    f.seek(start)
+                    sample = f.read(1 << 16)
+                piece_bytes = max(1, chunksize * len(sample) // max(1, sample.count(b"\n")))
+            else:
+                piece_bytes = PIECE_BYTES
+            tasks = [
+                {"path": path, "start": a, "end": b, "columns": columns, "level": level,
+                 "options": source_options(path, sep), "all_columns": all_columns, "date_format": date_formats[level], "tag": f"{level}-{i}-{run_id}",
+                 "store_root": store_root if (status[level] == "complet" or not rebuild) else None}
+                for i, (a, b) in enumerate(split_ranges(path, start, piece_bytes))
+            ]
+            pending[level] = pool.map(clean_range, tasks)
+
+    def serial_pieces(level, chunks):
+        """Mode séquentiel : mêmes blocs, traités dans ce processus."""
+        for i, raw in enumerate(chunks):
+            clean = clean_with_all_columns(raw, level, all_columns, date_formats[level])
+            yield render_piece(clean, level, f"{level}-{i}-{run_id}",
+                               store_root if (status[level] == "complet" or not rebuild) else None)
+
+    all_file = open(OUT["All"], "w" if rebuild else "a", encoding="utf-8", newline="")
+    if rebuild:
+        all_file.write(pd.DataFrame(columns=all_columns).to_csv(index=False))
+    store_ok = None
+    report = []
+    for level, path in SRC.items():
+        columns, sep = headers[level]
+        entry = sources.get(level, {})
+        rows, mins, maxs, nat = 0, [], [], 0
+        if status[level] != "complet":
+            rows, nat = entry["rows"], entry.get("dates_invalides", 0)
+            mins, maxs = [pd.Timestamp(entry["dates_min"])], [pd.Timestamp(entry["dates_max"])]
+        if level in pending:
+            pieces = pending[level]
+        elif status[level] == "complet":
+            pieces = serial_pieces(level, read_csv_auto(path, sep, chunksize))
+        elif status[level] == "ajout":
+            pieces = serial_pieces(level, read_new_rows(path, entry["size"], columns, sep, chunksize))
+        else:
+            pieces = []
+
+        with prof.stage("nettoyage", niveau=level, statut=status[level]) as stage:
+            if status[level] != "inchangé":
+                with open(OUT[level], "w" if status[level] == "complet" else "a", encoding="utf-8", newline="") as level_file:
+                    if status[level] == "complet":
+                        level_file.write(pd.DataFrame(columns=all_columns).to_csv(index=False))
+                    for piece in pieces:
+                        level_file.write(piece["level_csv"])
+                        if status[level] == "complet" or not rebuild:
+                            all_file.write(piece["all_csv"])
+                        store_ok = piece["store_ok"] if piece["store_ok"] is not None else store_ok
+                        rows += piece["rows"]
+                        nat += piece["nat"]
+                        mins.append(piece["min"])
+                        maxs.append(piece["max"])
+            if rebuild and status[level] != "complet":
+                # niveau non retraité : relu depuis sa sortie (déjà complétée) pour rester dans l'ordre de SRC
+                for i, clean in enumerate(read_clean_output(level, columns, chunksize)):
+                    piece = render_piece(clean, level, f"{level}-r{i}-{run_id}", store_root, level_csv=False)
+                    all_file.write(piece["all_csv"])
+                    store_ok = piece["store_ok"] if piece["store_ok"] is not None else store_ok
+            stage.rows = rows
+
+        d_min, d_max = str(pd.Series(mins, dtype="datetime64[ns]").min()), str(pd.Series(maxs, dtype="datetime64[ns]").max())
+        sources[level] = {
+            **{k: fps[level][k] for k in ("size", "mtime", "sha256")},
+            "columns": columns,
+            "sep": sep,
+            "date_format": date_formats.get(level),
+            "rows": rows,
+            "dates_invalides": nat,
+            "dates_min": d_min,
+            "dates_max": d_max,
+        }
+        report.append({
+            "Fichier": path.name,
+            "Granularite": level,
+            "Statut": status[level],
+            "Lignes": rows,
+            "Dates invalides": nat,
+            "Colonnes": len(all_columns),
+            "Dates min": d_min,
+            "Dates max": d_max
+        })
+    all_file.close()
+    if pool is not None:
+        pool.shutdown()
+
+    with prof.stage("manifeste"):
+        save_manifest(MANIFEST, {"all_columns": all_columns, "sources": sources})
+
+    # Étape 5 : colonnes binaires (datum int64, produits float32), retriées depuis le consolidé
+    columns_rows = None
+    if any(st_ != "inchangé" for st_ in status.values()) or not columns_exist(COLUMNS_DIR):
+        wanted = {"datum", LEVEL_COL, HOUR_COL, *PRODUCTS}
+        with prof.stage("colonnes binaires") as stage:
+            chunks = pd.read_csv(OUT["All"], usecols=lambda c: c in wanted, dtype={LEVEL_COL: str},
+                                 chunksize=chunksize or COLUMNS_CHUNK_ROWS, float_precision="round_trip")
+            columns_rows = write_columns(chunks, COLUMNS_DIR, "datum", [p for p in PRODUCTS if p in all_columns])
+            stage.rows = columns_rows
+
+    # Étape 4 : rapport
+    print("\n=== Rapport de nettoyage ===")
+    for r in report:
+        print(f"{r['Fichier']:<30} | {r['Granularite']:<8} | {r['Statut']:<8} | Lignes: {r['Lignes']:<6} | Colonnes: {r['Colonnes']:<3} | Dates: {r['Dates min']} → {r['Dates max']}")
+        if r["Dates invalides"]:
+            print(f"{'':<30}   ⚠ {r['Dates invalides']} dates illisibles (NaT)")
+
+    print("\n=== Fichiers générés ===")
+    for k, p in OUT.items():
+        print(f"- {k}: {p}")
+    if columns_rows is not None:
+        print(f"- Colonnes: {COLUMNS_DIR}/ ({columns_rows} lignes)")
+    if store_ok:
+        print(f"- Store: {STORE}/")
+    elif store_ok is False:
+        print("- Store: ignoré (pyarrow non installé)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Nettoyage et consolidation des ventes pharma.")
+    parser.add_argument("--full", action="store_true", help="ignorer le manifeste et tout reconstruire")
+    parser.add_argument("--chunksize", type=int, default=None,
+                        help="traitement en flux par blocs de N lignes (mémoire bornée)")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="nombre de processus pour nettoyer niveaux et tranches en parallèle")
+    parser.add_argument("--date-format", action="append", default=[], metavar="NIVEAU=FORMAT",
+                        help="format strptime imposé pour un niveau, ex. Hourly='%%m/%%d/%%Y %%H:%%M'")
+    parser.add_argument("--profile", metavar="TRACE.json", default=None,
+                        help="chronométrer les étapes et écrire une trace (chrome://tracing, Perfetto)")
+    parser.add_argument("--profile-memory", action="store_true",
+                        help="avec --profile : pic mémoire par étape (tracemalloc, plus lent)")
+    args = parser.parse_args()
+    forced = dict(item.split("=", 1) for item in args.date_format)
+    main(full=args.full, chunksize=args.chunksize, jobs=args.jobs, date_formats_forced=forced,
+         profile=args.profile, profile_memory=args.profile_memory)
@@ -0,0 +1,76 @@
+# dates.py
+"""Analyse des dates : format détecté une fois par source, puis conversion vectorisée et mémoïsée."""
+import pandas as pd
+
+# Formats candidats, essayés sur un échantillon de valeurs distinctes
+DATE_FORMATS = [
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d %H:%M",
+    "%Y-%m-%d",
+    "%m/%d/%Y %H:%M:%S",
+    "%m/%d/%Y %H:%M",
+    "%m/%d/%Y",
+    "%d/%m/%Y %H:%M:%S",
+    "%d/%m/%Y %H:%M",
+    "%d/%m/%Y",
+    "%d.%m.%Y %H:%M",
+    "%d.%m.%Y",
+    "%Y/%m/%d",
+]
+# Au-delà de ce nombre de valeurs distinctes, date et heure sont analysées séparément
+# (les données horaires répètent chaque date 24 fois)
+SPLIT_MIN_UNIQUES = 10_000
+
+
+class AmbiguousDateFormat(ValueError):
+    """Plusieurs formats lisent toutes les dates de l'échantillon avec des résultats différents."""
+
+    def __init__(self, formats: list, examples: list):
+        self.formats = formats
+        self.examples = examples
+        super().__init__(f"format de date ambigu entre {', '.join(formats)} (ex. {', '.join(examples)})")
+
+
+def _fits(values, fmt: str, min_share: float = 1.0) -> bool:
+    parsed = pd.to_datetime(values, format=fmt, errors="coerce")
+    return bool(parsed.notna().all()) if min_share >= 1 else bool(parsed.notna().mean() >= min_share)
+
+
+def detect_format(values, sample_size: int = 5000, min_share: float = 1.0):
+    """Format unique qui lit toutes les valeurs distinctes de l'échantillon (au moins min_share d'entre elles).
+
+    Renvoie None si aucun candidat ne convient ; lève AmbiguousDateFormat si plusieurs
+    candidats conviennent mais ne donnent pas les mêmes dates (ex. 1/2/2014).
+    """
+    uniques = pd.Series(values).dropna().astype(str).str.strip().unique()
+    if len(uniques) == 0:
+        return None
+    candidates = [f for f in DATE_FORMATS if _fits(uniques[:sample_size], f, min_share)]
+    if len(candidates) > 1 and len(uniques) > sample_size:
+        # on élargit à toutes les valeurs distinctes avant de conclure à l'ambiguïté
+        candidates = [f for f in candidates if _fits(uniques, f, min_share)]
+    if len(candidates) > 1:
+        ref = pd.to_datetime(uniques, format=candidates[0], errors="coerce")
+        if any(not pd.to_datetime(uniques, format=f, errors="coerce").equals(ref) for f in candidates[1:]):
+            raise AmbiguousDateFormat(candidates, [str(v) for v in uniques[:3]])
+    return candidates[0] if candidates else None
+
+
+def parse_dates(values, fmt=None) -> pd.Series:
+    """Conversion vectorisée : chaque chaîne distincte n'est analysée qu'une fois.
+
+    fmt=None laisse pandas deviner le format (à éviter, voir detect_format).
+    """
+    s = pd.Series(values)
+    codes, uniques = pd.factorize(s)
+    uniques = pd.Series(uniques, dtype=object).astype(str).str.strip()
+    if fmt and " " in fmt and len(uniques) > SPLIT_MIN_UNIQUES:
+        date_fmt, time_fmt = fmt.split(" ", 1)
+        parts = uniques.str.partition(" ")
+        day = parse_dates(parts[0], date_fmt)
+        tod = parse_dates(parts[2], time_fmt) - pd.Timestamp("1900-01-01")
+        parsed = pd.DatetimeIndex(day + tod)
+    else:
+        parsed = pd.DatetimeIndex(pd.to_datetime(uniques, format=fmt, errors="coerce"))
+    out = parsed.take(codes, allow_fill=True, fill_value=pd.NaT)
+    return pd.Series(out, index=s.index, name=s.name)
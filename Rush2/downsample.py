@@ -0,0 +1,47 @@
+# downsample.py
+"""Réduction des séries avant l'envoi au navigateur : on garde des points réels (valeurs exactes),
+choisis pour conserver la forme de la courbe."""
+import numpy as np
+
+
+def lttb_indices(y, n_out: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets : indices des n_out points retenus (premier et dernier inclus)."""
+    y = np.nan_to_num(np.asarray(y, dtype="float64"))
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.arange(n, dtype="float64")
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)  # n_out - 2 cases entre le premier et le dernier point
+    keep = np.empty(n_out, dtype=int)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for k in range(n_out - 2):
+        lo, hi = edges[k], edges[k + 1]
+        # moyenne de la case suivante (ou dernier point)
+        nlo, nhi = hi, edges[k + 2] if k + 2 < len(edges) else n
+        cx, cy = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(area.argmax())
+        keep[k + 1] = a
+    return keep
+
+
+def minmax_indices(y, n_out: int) -> np.ndarray:
+    """Min et max de chaque case (n_out // 2 cases) : aucun pic n'est perdu."""
+    y = np.nan_to_num(np.asarray(y, dtype="float64"))
+    n = len(y)
+    n_buckets = n_out // 2
+    if n_out >= n or n_buckets < 1:
+        return np.arange(n)
+    edges = np.linspace(0, n, n_buckets + 1).astype(int)
+    starts = edges[:-1]
+    keep = []
+    for lo, hi in zip(starts, edges[1:]):
+        seg = y[lo:hi]
+        keep.extend((lo + int(seg.argmin()), lo + int(seg.argmax())))
+    return np.unique(keep)
+
+
+def point_budget(width_px: int, px_per_point: float = 2.0) -> int:
+    """Nombre de points utiles pour une largeur de graphique donnée."""
+    return max(3, int(width_px / px_per_point))
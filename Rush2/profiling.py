@@ -0,0 +1,179 @@
+# profiling.py
+"""Chronométrage des étapes (temps, mémoire, lignes), sans coût quand il est désactivé.
+
+    prof = Profiler(enabled=True)
+    with prof.stage("agrégation") as s:
+        out = ...
+        s.rows = len(out)
+    prof.chrome_trace()  # format Trace Event : chrome://tracing, Perfetto
+    prof.close()         # fin du passage : arrête tracemalloc si ce profileur l'a démarré
+
+Profiler est aussi un gestionnaire de contexte (close() à la sortie). Le mode mémoire s'appuie sur
+tracemalloc, global au processus : les pics par étape ne sont justes que pour une session à la fois.
+"""
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+import pandas as pd
+
+
+class _NullStage:
+    """Étape fantôme du profileur désactivé : entrée / sortie vides, attributs ignorés."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+_trace_lock = threading.Lock()
+_trace_users = 0  # profileurs mémoire ouverts
+_trace_owned = False  # tracemalloc démarré par eux (pas par l'appelant, ex. bench.py)
+
+
+def _acquire_tracing():
+    global _trace_users, _trace_owned
+    with _trace_lock:
+        if _trace_users == 0:
+            _trace_owned = not tracemalloc.is_tracing()
+            if _trace_owned:
+                tracemalloc.start()
+        _trace_users += 1
+
+
+def _release_tracing():
+    """Le dernier profileur mémoire fermé arrête tracemalloc, s'il l'avait démarré."""
+    global _trace_users, _trace_owned
+    with _trace_lock:
+        _trace_users -= 1
+        if _trace_users == 0 and _trace_owned:
+            tracemalloc.stop()
+            _trace_owned = False
+
+
+class _Stage:
+    def __init__(self, prof: "Profiler", name: str, args: dict):
+        self.prof = prof
+        self.name = name
+        self.args = args
+        self.rows = None
+        self.peak = 0
+
+    def __enter__(self):
+        stack = self.prof._stack()
+        self.depth = len(stack)
+        stack.append(self)
+        if self.prof.memory:
+            self.mem_start = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        stack = self.prof._stack()
+        stack.pop()
+        record = {
+            "name": self.name,
+            "start": self.start - self.prof.origin,
+            "dur": end - self.start,
+            "rows": self.rows,
+            "depth": self.depth,
+            "tid": threading.get_ident(),
+            "args": self.args,
+        }
+        if self.prof.memory:
+            # le pic d'une étape imbriquée remonte au parent (reset_peak est global)
+            self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+            record["mem_mb"] = (self.peak - self.mem_start) / 2**20
+            if stack:
+                stack[-1].peak = max(stack[-1].peak, self.peak)
+        self.prof.records.append(record)
+        return False
+
+
+class Profiler:
+    """Enregistre les étapes d'un passage ; désactivé, stage() renvoie toujours le même objet vide."""
+
+    def __init__(self, enabled: bool = False, memory: bool = False, name: str = "rush2"):
+        self.enabled = enabled
+        self.memory = enabled and memory
+        self.name = name
+        self.records = []
+        self.origin = time.perf_counter()
+        self.epoch_us = time.time() * 1e6  # début du passage, pour placer la trace dans le temps
+        self._local = threading.local()
+        self._tracing = self.memory
+        if self._tracing:
+            _acquire_tracing()
+
+    def close(self) -> None:
+        """Fin du passage (sans effet au second appel) ; les étapes déjà enregistrées restent lisibles."""
+        if self._tracing:
+            self._tracing = False
+            _release_tracing()
+
+    def __enter__(self) -> "Profiler":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def _stack(self) -> list:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def stage(self, name: str, **args):
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name, args)
+
+    def summary(self) -> pd.DataFrame:
+        """Une ligne par étape, dans l'ordre d'exécution (temps en ms)."""
+        cols = ["Étape", "ms", "Lignes"] + (["Mo"] if self.memory else [])
+        rows = []
+        for r in sorted(self.records, key=lambda r: r["start"]):
+            label = r["name"] + (f" [{', '.join(str(v) for v in r['args'].values())}]" if r["args"] else "")
+            row = ["  " * r["depth"] + label, round(r["dur"] * 1000, 2), r["rows"]]
+            if self.memory:
+                row.append(round(r["mem_mb"], 2))
+            rows.append(row)
+        out = pd.DataFrame(rows, columns=cols)
+        out["Lignes"] = out["Lignes"].astype("Int64")
+        return out
+
+    def chrome_trace(self) -> dict:
+        """Événements complets (ph=X) au format Trace Event."""
+        pid = os.getpid()
+        events = [{"name": "process_name", "ph": "M", "pid": pid, "args": {"name": self.name}}]
+        for r in self.records:
+            args = {**r["args"], **{k: r[k] for k in ("rows", "mem_mb") if r.get(k) is not None}}
+            events.append({
+                "name": r["name"], "cat": self.name, "ph": "X", "pid": pid, "tid": r["tid"],
+                "ts": self.epoch_us + r["start"] * 1e6, "dur": r["dur"] * 1e6, "args": args,
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def merge_traces(traces: list) -> dict:
+    """Regroupe plusieurs traces (ex. les derniers passages de l'app) en un seul fichier."""
+    return {"traceEvents": [e for t in traces for e in t["traceEvents"]], "displayTimeUnit": "ms"}
+
+
+def write_trace(trace: dict, path) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(trace, f)
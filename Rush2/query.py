@@ -0,0 +1,287 @@
+# query.py
+"""Moteur de requêtes sur les agrégats, sans Streamlit : les mêmes chiffres que le tableau de bord
+(plage recalée, séries, kpi, empilement top-k + « Autres », classement, heatmap)."""
+import datetime as dt
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import rootpath  # noqa: F401  (ingest.py, à la racine du dépôt)
+from ingest import read_csv, read_header
+
+from columns import MappedColumns, columns_exist
+from dates import AmbiguousDateFormat, detect_format, parse_dates
+from rollups import Rollups
+from schema import PRODUCTS, SCHEMA, apply_schema, read_dtypes
+from store import iter_store, store_columns
+
+DATE_COL = "datum"
+KNOWN_PRODUCTS = PRODUCTS
+GRANULARITIES = {"Heure": "h", "Jour": "D", "Semaine": "W-MON", "Mois": "MS"}
+JOURS = ["lundi", "mardi", "mercredi", "jeudi", "vendredi", "samedi", "dimanche"]
+TOPK_STACK = 8
+CHUNK_ROWS = 500_000
+REDETECT_NAT_RATE = 0.5  # part de dates illisibles d'un morceau au-delà de laquelle le format est re-détecté
+REDETECT_MIN_SHARE = 0.9  # le nouveau format doit lire au moins cette part des valeurs du morceau
+PARTS = ("kpi", "series", "stack", "ranking", "heatmap")
+
+
+# === Chargement ===
+
+def iter_source_chunks(path=None, uploaded=None, usecols=None, dtype_map=None, date_col=DATE_COL,
+                       levels=None, chunk_rows: int = CHUNK_ROWS, dialect=None):
+    """Morceaux d'une source : colonnes memmap, store Parquet, CSV sur disque ou fichier importé.
+
+    Types du schéma (schema.py) quelle que soit la source ; dtype_map les complète ou les remplace.
+    dialect : dialecte CSV déjà détecté (ingest.Dialect), sinon détecté sur le début de la source.
+    """
+    if path is not None and columns_exist(path):
+        # vues sur les colonnes memmap, datum déjà trié et en datetime (produits déjà en float32)
+        for frame in MappedColumns(path).iter_frames(columns=usecols, levels=levels, batch_rows=chunk_rows):
+            yield apply_schema(frame)
+        return
+    if path is not None and Path(path).is_dir():
+        # élagage colonnes + partitions, datum déjà en datetime
+        for frame in iter_store(path, columns=usecols, levels=levels, batch_rows=chunk_rows):
+            yield apply_schema(frame)
+        return
+    src = uploaded if uploaded is not None else path
+    if uploaded is not None:
+        uploaded.seek(0)
+    # catégories et float32 fixés à la lecture, petits entiers convertis ensuite (read_dtypes) ;
+    # séparateur, encodage et décimale détectés par ingest.py
+    dtypes = {**read_dtypes(SCHEMA), **(dtype_map or {})}
+    fmt = None
+    for i, chunk in enumerate(read_csv(src, usecols=usecols, dtype=dtypes, chunksize=chunk_rows,
+                                                dialect=dialect)):
+        if i == 0:
+            # format détecté sur le premier morceau
+            fmt = detect_format(chunk[date_col])
+        raw = chunk[date_col]
+        parsed = parse_dates(raw, fmt)
+        failed = int((parsed.isna() & raw.notna()).sum())
+        if failed > REDETECT_NAT_RATE * raw.notna().sum():
+            # format différent plus loin dans le fichier : re-détection sur ce morceau
+            try:
+                other = detect_format(raw, min_share=REDETECT_MIN_SHARE)
+            except AmbiguousDateFormat:
+                other = None
+            if other is not None and other != fmt:
+                reparsed = parse_dates(raw, other)
+                if reparsed.isna().sum() < parsed.isna().sum():
+                    fmt, parsed = other, reparsed
+        # dates encore illisibles : NaT, comptées par RollupBuilder (Rollups.undated)
+        chunk[date_col] = parsed
+        yield apply_schema(chunk)
+
+
+def source_columns(path) -> list:
+    """Colonnes d'une source sur disque, sans lire les données."""
+    path = Path(path)
+    if columns_exist(path):
+        return MappedColumns(path).columns
+    if path.is_dir():
+        return store_columns(path)
+    return read_header(path)
+
+
+def load_rollups(path, levels=None, chunk_rows: int = CHUNK_ROWS) -> Rollups:
+    """Agrégats d'une source sur disque (produits connus et Hour détectés dans l'en-tête)."""
+    columns = source_columns(path)
+    products = [c for c in KNOWN_PRODUCTS if c in columns]
+    hour_col = "Hour" if "Hour" in columns else None
+    usecols = [DATE_COL] + products + ([hour_col] if hour_col else [])
+    chunks = iter_source_chunks(Path(path), usecols=usecols, levels=levels, chunk_rows=chunk_rows)
+    return Rollups.from_chunks(chunks, DATE_COL, products, hour_col)
+
+
+# === Requêtes ===
+
+def snap_range_to_available(d1, d2, avail_np):
+    if d1 > d2:
+        return None, None
+    d1d = np.datetime64(pd.to_datetime(d1).date())
+    d2d = np.datetime64(pd.to_datetime(d2).date())
+    i = avail_np.searchsorted(d1d, side="left")
+    j = avail_np.searchsorted(d2d, side="right") - 1
+    if i >= len(avail_np) or j < 0 or i > j:
+        return None, None
+    start_snap = pd.to_datetime(avail_np[i]).normalize()
+    end_snap_excl = pd.to_datetime(avail_np[j]).normalize() + pd.Timedelta(days=1)
+    return start_snap, end_snap_excl
+
+
+def kpis_from_resampled(resampled, range_totals, range_days):
+    if resampled.empty:
+        return 0.0, np.nan, "—", 0
+    total = range_totals.sum()
+    daily_avg = float(total / range_days) if range_days else np.nan
+    totals_by_prod = range_totals.sort_values(ascending=False)
+    top_prod = totals_by_prod.index[0] if len(totals_by_prod) else "—"
+    n_points = len(resampled)
+    return float(total), daily_avg, top_prod, n_points
+
+
+def stack_frame(resampled, range_totals, top_k: int = TOPK_STACK) -> pd.DataFrame:
+    """Séries des top_k produits de la plage, le reste sommé dans « Autres » (format large)."""
+    prod_cols = [c for c in resampled.columns if c != DATE_COL]
+    topk = range_totals.sort_values(ascending=False).index[:top_k].tolist()
+    others = [c for c in prod_cols if c not in topk]
+    out = resampled[[DATE_COL] + topk].copy()
+    if others:
+        out["Autres"] = resampled[others].sum(axis=1)
+    return out
+
+
+def ranking(range_totals, bottom: bool = False, n: int = 10) -> pd.DataFrame:
+    totals = range_totals.reset_index()
+    totals.columns = ["product", "Quantité (g)"]
+    return totals.sort_values("Quantité (g)", ascending=bottom).head(int(n))
+
+
+def heatmap_frame(rollups: Rollups, start, end, products: list):
+    """Heatmap jour × heure libellée (None si la source n'a pas de colonne Hour)."""
+    heat = rollups.heatmap(start, end, products)
+    if heat is None:
+        return None
+    # libellés appliqués aux 7 lignes seulement, sans dépendre d'une locale système
+    return pd.DataFrame({
+        "Jour": np.array(JOURS, dtype=object)[heat["weekday"].to_numpy()],
+        "Heure": heat["Heure"].to_numpy(),
+        "Quantité (g)": heat["total"].to_numpy(),
+    })
+
+
+@dataclass(frozen=True)
+class QueryRequest:
+    """Produits, période [start, end] (bornes incluses, comme le sélecteur de dates) et granularité."""
+
+    products: tuple
+    start: dt.date
+    end: dt.date
+    granularity: str = "Jour"
+    parts: tuple = PARTS
+    top_k: int = TOPK_STACK
+    rank_n: int = 10
+    rank_bottom: bool = False
+
+    def __post_init__(self):
+        if not self.products:
+            raise ValueError("au moins un produit")
+        if self.granularity not in GRANULARITIES:
+            raise ValueError(f"granularité inconnue {self.granularity!r} (attendu : {', '.join(GRANULARITIES)})")
+        unknown = set(self.parts) - set(PARTS)
+        if unknown:
+            raise ValueError(f"parties inconnues : {', '.join(sorted(unknown))}")
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "QueryRequest":
+        """Depuis du JSON : dates ISO, listes converties en tuples (requête hachable, donc cachable)."""
+        if not isinstance(d, dict):
+            raise ValueError(f"requête attendue sous forme d'objet JSON, reçu {type(d).__name__}")
+        try:
+            return cls(
+                products=_strings(d, "products", None),
+                start=_iso_date(d, "start"),
+                end=_iso_date(d, "end"),
+                granularity=d.get("granularity", "Jour"),
+                parts=_strings(d, "parts", PARTS),
+                top_k=int(d.get("top_k", TOPK_STACK)),
+                rank_n=int(d.get("rank_n", 10)),
+                rank_bottom=bool(d.get("rank_bottom", False)),
+            )
+        except KeyError as e:
+            raise ValueError(f"champ manquant : {e.args[0]}") from None
+        except TypeError as e:
+            raise ValueError(f"type invalide : {e}") from None
+
+
+def _strings(d: dict, name: str, default) -> tuple:
+    """Liste JSON de chaînes -> tuple ; une chaîne seule n'est pas découpée en lettres."""
+    value = d[name] if default is None else d.get(name, default)
+    if not isinstance(value, (list, tuple)) or not all(isinstance(v, str) for v in value):
+        raise ValueError(f"{name} : liste de chaînes attendue")
+    return tuple(value)
+
+
+def _iso_date(d: dict, name: str) -> dt.date:
+    value = d[name]
+    if not isinstance(value, str):
+        raise ValueError(f"{name} : date ISO attendue (AAAA-MM-JJ), reçu {_json_type(value)}")
+    return dt.date.fromisoformat(value)
+
+
+def _json_type(value) -> str:
+    return "null" if value is None else type(value).__name__
+
+
+@dataclass
+class QueryResult:
+    start: pd.Timestamp = None  # plage recalée sur les jours disponibles, fin exclue
+    end: pd.Timestamp = None
+    kpi: dict = field(default_factory=dict)
+    series: pd.DataFrame = None
+    stack: pd.DataFrame = None
+    ranking: pd.DataFrame = None
+    heatmap: pd.DataFrame = None
+
+    def to_dict(self) -> dict:
+        def records(df):
+            if df is None:
+                return None
+            out = df.copy()
+            for c in out.columns:
+                if pd.api.types.is_datetime64_any_dtype(out[c]):
+                    out[c] = out[c].dt.strftime("%Y-%m-%dT%H:%M:%S")
+            out = out.astype(object).where(out.notna(), None)
+            return out.to_dict(orient="records")
+
+        kpi = {k: (None if isinstance(v, float) and np.isnan(v) else v) for k, v in self.kpi.items()}
+        return {
+            "start": None if self.start is None else self.start.isoformat(),
+            "end": None if self.end is None else self.end.isoformat(),
+            "kpi": kpi,
+            "series": records(self.series),
+            "stack": records(self.stack),
+            "ranking": records(self.ranking),
+            "heatmap": records(self.heatmap),
+        }
+
+
+class QueryEngine:
+    """Requêtes typées sur un objet Rollups (un par jeu de données)."""
+
+    def __init__(self, rollups: Rollups):
+        self.rollups = rollups
+        self.available_dates = rollups.available_dates()
+
+    @property
+    def products(self) -> list:
+        return self.rollups.products
+
+    def run(self, req: QueryRequest) -> QueryResult:
+        unknown = [p for p in req.products if p not in self.products]
+        if unknown:
+            raise ValueError(f"produits absents de la source : {', '.join(unknown)}")
+        products = list(req.products)
+        start, end = snap_range_to_available(req.start, req.end, self.available_dates)
+        if start is None:
+            return QueryResult()
+        rule = GRANULARITIES[req.granularity]
+        resampled = self.rollups.resampled(start, end, rule, products)
+        range_totals, range_days = self.rollups.totals(start, end, products)
+        result = QueryResult(start=start, end=end)
+        if "kpi" in req.parts:
+            total, daily_avg, top, n_points = kpis_from_resampled(resampled, range_totals, range_days)
+            result.kpi = {"total": total, "daily_avg": daily_avg, "top_product": top, "n_points": n_points}
+        if "series" in req.parts:
+            result.series = resampled
+        if "stack" in req.parts and not resampled.empty:
+            result.stack = stack_frame(resampled, range_totals, req.top_k)
+        if "ranking" in req.parts and not resampled.empty:
+            result.ranking = ranking(range_totals, req.rank_bottom, req.rank_n)
+        if "heatmap" in req.parts:
+            result.heatmap = heatmap_frame(self.rollups, start, end, products)
+        return result
@@ -0,0 +1,132 @@
+# query_server.py
+"""Point d'accès HTTP/JSON local au moteur de requêtes (sans Streamlit).
+
+    python3 query_server.py --source pharma_columns --port 8765
+
+    GET  /health                         -> source, produits, dates disponibles, statistiques du cache
+    POST /query  {"products": [...], "start": "2015-01-01", "end": "2015-12-31", "granularity": "Mois"}
+    POST /query  {"queries": [{...}, {...}]}   (lot : une réponse par requête, dans l'ordre)
+"""
+import argparse
+import json
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from query import QueryEngine, QueryRequest, load_rollups
+
+CACHE_SIZE = 4096  # réponses gardées (clé : requête normalisée)
+MAX_BODY = 16 * 1024 * 1024
+
+
+class ResponseCache:
+    """Cache LRU requête -> réponse JSON déjà sérialisable, avec compteurs."""
+
+    def __init__(self, size: int = CACHE_SIZE):
+        self.size = size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, req: QueryRequest, compute):
+        with self._lock:
+            if req in self._items:
+                self._items.move_to_end(req)
+                self.hits += 1
+                return self._items[req]
+            self.misses += 1
+        value = compute()
+        with self._lock:
+            self._items[req] = value
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+        return value
+
+    def stats(self) -> dict:
+        return {"entrees": len(self._items), "taille": self.size, "hits": self.hits, "misses": self.misses}
+
+
+def answer(engine: QueryEngine, cache: ResponseCache, payload: dict) -> dict:
+    """Réponse à une requête JSON ; les erreurs de saisie sont renvoyées dans la réponse."""
+    try:
+        req = QueryRequest.from_dict(payload)
+        return cache.get_or_compute(req, lambda: engine.run(req).to_dict())
+    except (ValueError, TypeError, AttributeError) as e:
+        return {"error": str(e)}
+
+
+def make_handler(engine: QueryEngine, cache: ResponseCache, source: str):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status: int, body: dict):
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path != "/health":
+                return self._send(404, {"error": "chemin inconnu"})
+            dates = engine.available_dates
+            self._send(200, {
+                "source": source,
+                "products": engine.products,
+                "dates": [str(dates[0])[:10], str(dates[-1])[:10]] if len(dates) else None,
+                "cache": cache.stats(),
+            })
+
+        def do_POST(self):
+            if self.path != "/query":
+                return self._send(404, {"error": "chemin inconnu"})
+            length = int(self.headers.get("Content-Length", 0))
+            if length > MAX_BODY:
+                return self._send(413, {"error": "requête trop volumineuse"})
+            try:
+                payload = json.loads(self.rfile.read(length) or b"{}")
+            except json.JSONDecodeError as e:
+                return self._send(400, {"error": f"JSON invalide : {e}"})
+            if isinstance(payload, dict) and "queries" in payload:
+                if not isinstance(payload["queries"], list):
+                    return self._send(400, {"error": "queries : liste de requêtes attendue"})
+                # lot : agrégats partagés, réponses en cache réutilisées requête par requête
+                results = [answer(engine, cache, q) for q in payload["queries"]]
+                return self._send(200, {"results": results})
+            result = answer(engine, cache, payload)
+            self._send(400 if "error" in result else 200, result)
+
+        def log_message(self, fmt, *args):
+            pass  # pas de ligne par requête : les lots de reporting en envoient des milliers
+
+    return Handler
+
+
+def serve(source: Path, host: str = "127.0.0.1", port: int = 8765, levels=None, cache_size: int = CACHE_SIZE):
+    print(f"Chargement des agrégats depuis {source}…")
+    engine = QueryEngine(load_rollups(source, levels=levels))
+    cache = ResponseCache(cache_size)
+    server = ThreadingHTTPServer((host, port), make_handler(engine, cache, str(source)))
+    print(f"Requêtes sur http://{host}:{port}/query (Ctrl+C pour arrêter)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="API JSON locale sur les ventes pharma agrégées.")
+    parser.add_argument("--source", type=Path, default=None,
+                        help="pharma_columns/, pharma_store/ ou un CSV consolidé (défaut : le premier présent)")
+    parser.add_argument("--levels", nargs="*", default=None, help="granularités sources à garder")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--cache-size", type=int, default=CACHE_SIZE)
+    args = parser.parse_args()
+    source = args.source or next(
+        p for p in (Path("pharma_columns"), Path("pharma_store"), Path("pharma_consolidated_full.csv")) if p.exists()
+    )
+    serve(source, args.host, args.port, args.levels, args.cache_size)
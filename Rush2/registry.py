@@ -0,0 +1,108 @@
+# registry.py
+"""Registre des jeux de données partagé par toutes les sessions du processus.
+
+Une seule copie (en lecture seule) par contenu, éviction LRU sous un budget mémoire.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+DEFAULT_BUDGET_MB = int(os.environ.get("RUSH2_CACHE_MB", "1024"))
+HASH_BLOCK = 1 << 20
+
+
+def bytes_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+_file_digests = {}  # (chemin, taille, mtime) -> sha256, pour ne pas relire un fichier inchangé
+
+
+def file_digest(path: Path) -> str:
+    """sha256 du contenu d'un fichier, ou d'un répertoire (fichiers triés par chemin relatif)."""
+    path = Path(path)
+    files = sorted(p for p in path.rglob("*") if p.is_file()) if path.is_dir() else [path]
+    h = hashlib.sha256()
+    for f in files:
+        st = f.stat()
+        stamp = (str(f.resolve()), st.st_size, st.st_mtime_ns)
+        if stamp not in _file_digests:
+            fh = hashlib.sha256()
+            with open(f, "rb") as src:
+                for block in iter(lambda: src.read(HASH_BLOCK), b""):
+                    fh.update(block)
+            _file_digests[stamp] = fh.hexdigest()
+        h.update(str(f.relative_to(path)).encode() if path.is_dir() else b"")
+        h.update(_file_digests[stamp].encode())
+    return h.hexdigest()
+
+
+class DatasetRegistry:
+    """Cache LRU clé -> objet, borné en octets (objet.nbytes()), avec compteurs hit / miss / evict."""
+
+    def __init__(self, budget_bytes: int = DEFAULT_BUDGET_MB << 20):
+        self.budget_bytes = budget_bytes
+        self._items = OrderedDict()  # clé -> (objet, taille)
+        self._lock = threading.Lock()
+        self._building = {}  # clé -> verrou : un seul calcul par clé, les autres sessions attendent
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, key) -> bool:
+        """Présence sans compter de hit ni de miss (ni déplacer l'entrée dans l'ordre LRU)."""
+        with self._lock:
+            return key in self._items
+
+    def get_or_build(self, key, build):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key][0]
+            key_lock = self._building.setdefault(key, threading.Lock())
+        with key_lock:
+            with self._lock:
+                if key in self._items:  # construit par une autre session pendant l'attente
+                    self._items.move_to_end(key)
+                    self.hits += 1
+                    return self._items[key][0]
+                self.misses += 1
+            try:
+                value = build()
+                size = value.nbytes()
+                with self._lock:
+                    self._items[key] = (value, size)
+                    self._evict()
+            finally:
+                # même si build() échoue : pas de verrou orphelin, l'appel suivant refait le calcul
+                with self._lock:
+                    self._building.pop(key, None)
+        return value
+
+    def _evict(self):
+        # on garde toujours l'entrée la plus récente, même si elle dépasse le budget à elle seule
+        while len(self._items) > 1 and self.used_bytes() > self.budget_bytes:
+            self._items.popitem(last=False)
+            self.evictions += 1
+
+    def used_bytes(self) -> int:
+        return sum(size for _, size in self._items.values())
+
+    def clear(self):
+        with self._lock:
+            self.evictions += len(self._items)
+            self._items.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entrees": len(self._items),
+                "octets": self.used_bytes(),
+                "budget": self.budget_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
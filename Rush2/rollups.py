@@ -0,0 +1,259 @@
+# rollups.py
+"""Agrégats pré-calculés (heure, jour, semaine, mois, jour × heure) : les filtres de l'app
+sont servis depuis ces tables au lieu de rééchantillonner les lignes brutes."""
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+COUNT_COL = "_n"  # nombre de lignes brutes par case, pour borner les plages comme le faisait resample
+TABLE_RULES = ["h", "D", "W-MON", "MS"]
+HOURS = 24
+
+
+def resample_sum_wide(df_wide, date_col, rule):
+    if df_wide.empty:
+        return df_wide
+    return (
+        df_wide.set_index(date_col)
+               .sort_index()
+               .resample(rule)
+               .sum(min_count=1)
+               .reset_index()
+    )
+
+
+def _trim(table: pd.DataFrame) -> pd.DataFrame:
+    """Retire les cases vides en début et fin de plage (resample démarre à la première ligne)."""
+    filled = (table[COUNT_COL] > 0).to_numpy()
+    if not filled.any():
+        return table.iloc[0:0]
+    first = filled.argmax()
+    last = len(filled) - filled[::-1].argmax()
+    return table.iloc[first:last]
+
+
+def _bucket_bounds(index: pd.DatetimeIndex, rule: str):
+    """Début et fin (exclue) de chaque case d'une table."""
+    if rule == "W-MON":
+        # cases (mardi … lundi] étiquetées par le lundi
+        return index - pd.Timedelta(days=6), index + pd.Timedelta(days=1)
+    if rule == "MS":
+        return index, index + pd.offsets.MonthBegin(1)
+    step = pd.Timedelta(hours=1) if rule == "h" else pd.Timedelta(days=1)
+    return index, index + step
+
+
+def _aligned(start: pd.Timestamp, end: pd.Timestamp, rule: str) -> bool:
+    """La plage [start, end) tombe-t-elle exactement sur des frontières de cases ?"""
+    if rule == "W-MON":
+        return start.weekday() == 1 and end.weekday() == 1
+    if rule == "MS":
+        return start.day == 1 and end.day == 1
+    return True
+
+
+class Rollups:
+    """Sommes par produit à l'heure, au jour, à la semaine (W-MON) et au mois, plus jour × heure.
+
+    Construit une fois par chargement ; chaque requête part de la table la plus grossière
+    qui couvre exactement la plage demandée.
+    """
+
+    def __init__(self, tables: dict, heat, products: list, date_col: str, undated: int = 0):
+        self.tables = tables
+        self.heat = heat
+        self.products = products
+        self.date_col = date_col
+        self.undated = undated  # lignes écartées faute de date lisible (NaT)
+        # index de sommes cumulées sur les jours : total d'une plage = cum[j] - cum[i]
+        daily = tables["D"]
+        self.days = daily.index.to_numpy()
+        values = daily[products].fillna(0).to_numpy(dtype="float64")
+        self.cum = np.vstack([np.zeros((1, len(products))), values.cumsum(axis=0)])
+        self.filled = np.flatnonzero(daily[COUNT_COL].to_numpy() > 0)
+        # partagé entre sessions : les requêtes renvoient des copies, les index restent figés
+        for arr in (self.days, self.cum, self.filled):
+            arr.flags.writeable = False
+
+    def nbytes(self) -> int:
+        """Mémoire occupée (tables, jour × heure, index cumulé)."""
+        size = sum(int(f.memory_usage(index=True, deep=True).sum()) for f in self.tables.values())
+        size += self.heat.nbytes() if self.heat is not None else 0
+        return size + self.days.nbytes + self.cum.nbytes + self.filled.nbytes
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, date_col: str, products: list, hour_col=None) -> "Rollups":
+        return cls.from_chunks([df], date_col, products, hour_col)
+
+    @classmethod
+    def from_chunks(cls, chunks, date_col: str, products: list, hour_col=None) -> "Rollups":
+        """Agrégats exacts construits morceau par morceau : les lignes brutes ne sont jamais gardées."""
+        builder = RollupBuilder(date_col, products, hour_col)
+        for chunk in chunks:
+            builder.add(chunk)
+        return builder.build()
+
+    def available_dates(self):
+        """Jours contenant au moins une ligne (tableau numpy trié)."""
+        daily = self.tables["D"]
+        return daily.index[daily[COUNT_COL].to_numpy() > 0].to_numpy()
+
+    def totals(self, start, end, products: list):
+        """Totaux par produit sur [start, end) et nombre de jours couverts, en deux recherches binaires.
+
+        Le nombre de jours va du premier au dernier jour non vide de la plage (jours vides inclus),
+        comme la série journalière rééchantillonnée dont la moyenne donnait le KPI.
+        """
+        i = self.days.searchsorted(np.datetime64(pd.Timestamp(start)), side="left")
+        j = self.days.searchsorted(np.datetime64(pd.Timestamp(end)), side="left")
+        cols = [self.products.index(p) for p in products]
+        sums = pd.Series(self.cum[j, cols] - self.cum[i, cols], index=products)
+        a = self.filled.searchsorted(i, side="left")
+        b = self.filled.searchsorted(j, side="left") - 1
+        n_days = int(self.filled[b] - self.filled[a] + 1) if a <= b else 0
+        return sums, n_days
+
+    def _range(self, rule: str, start, end) -> pd.DataFrame:
+        table = self.tables[rule]
+        lo, hi = _bucket_bounds(table.index, rule)
+        return _trim(table[(lo >= start) & (hi <= end)])
+
+    def resampled(self, start, end, rule: str, products: list) -> pd.DataFrame:
+        """Équivalent de resample_sum_wide sur les lignes de [start, end) et les produits choisis."""
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        rule = "h" if rule in ("H", "h") else rule
+        if rule in self.tables and _aligned(start, end, rule):
+            out = self._range(rule, start, end)
+        else:
+            # semaine / mois à cheval sur la plage : on repart des jours
+            out = self._range("D", start, end)
+            out = out.resample(rule).sum(min_count=1) if not out.empty else out
+        out = out[products]
+        out.columns.name = None
+        return out.reset_index()
+
+    def heatmap(self, start, end, products: list):
+        """Total des produits choisis par (jour de semaine 0=lundi, heure), sur les jours de [start, end)."""
+        if self.heat is None:
+            return None
+        sums, counts = self.heat.week_hour(start, end)
+        cols = [self.products.index(p) for p in products]
+        weekday, hour = np.nonzero(counts)
+        total = sums[:, :, cols].sum(axis=2)
+        return pd.DataFrame({"weekday": weekday, "Heure": hour, "total": total[weekday, hour]})
+
+
+class HeatCube:
+    """Sommes jour × heure × produit en tableau dense, repliées en semaine (7 × 24 × produits) par bincount."""
+
+    def __init__(self, days: np.ndarray, sums: np.ndarray, counts: np.ndarray):
+        self.days = days  # datetime64[D] triés
+        self.sums = sums  # (jours, 24, produits)
+        self.counts = counts  # (jours, 24)
+        self.weekdays = (days.astype("int64") + 3) % 7  # 1970-01-01 est un jeudi -> 0 = lundi
+        for arr in (self.days, self.sums, self.counts, self.weekdays):
+            arr.flags.writeable = False
+        # le résultat ne dépend que de la plage : un changement de produits ne fait que sommer des tranches
+        self._week_hour = lru_cache(maxsize=16)(self._fold)
+
+    def nbytes(self) -> int:
+        return self.days.nbytes + self.sums.nbytes + self.counts.nbytes + self.weekdays.nbytes
+
+    def cache_info(self):
+        """Statistiques du cache des replis semaine × heure (hits, misses, taille)."""
+        return self._week_hour.cache_info()
+
+    def cache_clear(self):
+        self._week_hour.cache_clear()
+
+    def week_hour(self, start, end):
+        """(sommes 7 × 24 × produits, lignes 7 × 24) des jours de [start, end)."""
+        i = int(self.days.searchsorted(np.datetime64(pd.Timestamp(start), "D"), side="left"))
+        j = int(self.days.searchsorted(np.datetime64(pd.Timestamp(end), "D"), side="left"))
+        return self._week_hour(i, j)
+
+    def _fold(self, i: int, j: int):
+        n_products = self.sums.shape[2]
+        slot = self.weekdays[i:j, None] * HOURS + np.arange(HOURS)  # (jours, 24) -> case semaine × heure
+        keys = slot[:, :, None] * n_products + np.arange(n_products)
+        sums = np.bincount(keys.ravel(), weights=self.sums[i:j].ravel(), minlength=7 * HOURS * n_products)
+        counts = np.bincount(slot.ravel(), weights=self.counts[i:j].ravel(), minlength=7 * HOURS)
+        sums = sums.reshape(7, HOURS, n_products)
+        counts = counts.reshape(7, HOURS).astype("int64")
+        sums.flags.writeable = counts.flags.writeable = False
+        return sums, counts
+
+
+def _merge(acc, part):
+    """Somme deux tables partielles case par case (NaN seulement si la case est vide des deux côtés)."""
+    if acc is None:
+        return part
+    return pd.concat([acc, part]).groupby(level=list(range(part.index.nlevels))).sum(min_count=1)
+
+
+class RollupBuilder:
+    """Accumule les sommes horaires et jour × heure d'une suite de morceaux, puis construit Rollups."""
+
+    def __init__(self, date_col: str, products: list, hour_col=None):
+        self.date_col = date_col
+        self.products = products
+        self.hour_col = hour_col
+        self.hourly = None
+        self.heat = None
+        self.rows = 0
+        self.undated = 0
+
+    def add(self, chunk: pd.DataFrame):
+        n = len(chunk)
+        chunk = chunk.dropna(subset=[self.date_col])
+        self.undated += n - len(chunk)
+        if chunk.empty:
+            return
+        self.rows += len(chunk)
+        values = chunk[self.products].astype("float64")
+        grouped = values.groupby(chunk[self.date_col].dt.floor("h").rename(self.date_col))
+        part = grouped.sum(min_count=1)
+        part[COUNT_COL] = grouped.size()
+        self.hourly = _merge(self.hourly, part)
+
+        if self.hour_col is not None and self.hour_col in chunk.columns:
+            # jour × heure (colonne Hour des lignes horaires), filtrable par plage de dates
+            # Int16 nullable (schema.py) : NA -> NaN, exclu par le filtre
+            hours = pd.to_numeric(chunk[self.hour_col], errors="coerce").astype("float64")
+            valid = (hours >= 0) & (hours <= 23)
+            day = chunk.loc[valid, self.date_col].to_numpy().astype("datetime64[D]").astype("int64")
+            grouped = values[valid].groupby(day * HOURS + hours[valid].to_numpy().astype("int64"))
+            part = grouped.sum()
+            part[COUNT_COL] = grouped.size()
+            self.heat = _merge(self.heat, part)
+
+    def build(self) -> Rollups:
+        hourly = self.hourly
+        if hourly is None:
+            hourly = pd.DataFrame(columns=self.products + [COUNT_COL], dtype="float64",
+                                  index=pd.DatetimeIndex([], name=self.date_col))
+        # grille horaire continue, comme resample("h")
+        hourly = hourly.resample("h").sum(min_count=1)
+        hourly[COUNT_COL] = hourly[COUNT_COL].fillna(0).astype("int64")
+        tables = {"h": hourly}
+        daily = hourly.resample("D").sum(min_count=1)
+        daily[COUNT_COL] = hourly[COUNT_COL].resample("D").sum()
+        tables["D"] = daily
+        for rule in ("W-MON", "MS"):
+            table = daily.resample(rule).sum(min_count=1)
+            table[COUNT_COL] = daily[COUNT_COL].resample(rule).sum()
+            tables[rule] = table
+
+        heat = None
+        if self.hour_col is not None:
+            # clés jour * 24 + heure -> tableau dense (jours, 24, produits)
+            keys = self.heat.index.to_numpy() if self.heat is not None else np.empty(0, dtype="int64")
+            day_numbers, day_idx = np.unique(keys // HOURS, return_inverse=True)
+            sums = np.zeros((len(day_numbers), HOURS, len(self.products)))
+            counts = np.zeros((len(day_numbers), HOURS), dtype="int64")
+            if self.heat is not None:
+                sums[day_idx, keys % HOURS] = self.heat[self.products].to_numpy(dtype="float64")
+                counts[day_idx, keys % HOURS] = self.heat[COUNT_COL].to_numpy()
+            heat = HeatCube(day_numbers.astype("datetime64[D]"), sums, counts)
+        return Rollups(tables, heat, self.products, self.date_col, self.undated)
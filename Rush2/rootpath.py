@@ -0,0 +1,15 @@
+# rootpath.py
+"""Rend importables depuis ce dossier les modules communs de la racine du dépôt (ingest.py).
+
+    import rootpath  # noqa: F401
+    from ingest import read_csv
+
+Les scripts se lancent depuis leur dossier (python3 app.py, streamlit run app.py...) : ce dossier est déjà
+dans sys.path, la racine y est ajoutée ici, une seule fois.
+"""
+import sys
+from pathlib import Path
+
+ROOT = str(Path(__file__).resolve().parent.parent)
+if ROOT not in sys.path:
+    sys.path.append(ROOT)  # après le dossier du script : ses modules restent prioritaires
@@ -0,0 +1,59 @@
+# schema.py
+"""Types des colonnes nettoyées, fixés une fois pour le nettoyage, le store et l'app.
+
+Catégories pour les libellés répétés, petits entiers nullables pour Year / Month / Hour,
+float32 pour les produits.
+"""
+import pandas as pd
+
+LEVELS = ["Hourly", "Daily", "Weekly", "Monthly"]
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+PRODUCTS = ["M01AB", "M01AE", "N02BA", "N02BE", "N05B", "N05C", "R03", "R06"]
+
+SCHEMA = {
+    "granularite": pd.CategoricalDtype(LEVELS),
+    "datum": "datetime64[ns]",
+    "Year": "Int16",
+    "Month": "Int8",
+    "Weekday Name": pd.CategoricalDtype(WEEKDAYS),
+    "Hour": "Int16",  # les lignes Daily portent des valeurs jusqu'à ~300
+    **{p: "float32" for p in PRODUCTS},
+}
+
+
+def read_dtypes(columns) -> dict:
+    """dtype= pour read_csv (datum exclu : analysé à part, voir dates.py).
+
+    Les entiers nullables sont lus en texte puis convertis par apply_schema : "12.0" ou " 12 "
+    deviennent 12 et une valeur illisible NA, au lieu d'une erreur de read_csv.
+    """
+    return {c: "object" if SCHEMA[c] in ("Int8", "Int16") else SCHEMA[c]
+            for c in columns if c in SCHEMA and c != "datum"}
+
+
+def _categorical(s: pd.Series, dtype: pd.CategoricalDtype) -> pd.Series:
+    s = s.astype("object").where(s.notna(), None)
+    extra = [v for v in pd.unique(s.dropna()) if v not in dtype.categories]
+    if extra:
+        # libellé inattendu : ajouté aux catégories plutôt que perdu
+        dtype = pd.CategoricalDtype(list(dtype.categories) + sorted(map(str, extra)))
+    return s.astype(dtype)
+
+
+def apply_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """Colonnes connues converties aux types du schéma ; les autres sont laissées telles quelles."""
+    out = {}
+    for col in df.columns:
+        s = df[col]
+        dtype = SCHEMA.get(col)
+        if dtype is None or s.dtype == dtype:
+            out[col] = s
+        elif isinstance(dtype, pd.CategoricalDtype):
+            out[col] = _categorical(s, dtype)
+        elif col == "datum":
+            out[col] = pd.to_datetime(s, errors="coerce")
+        elif dtype == "float32":
+            out[col] = pd.to_numeric(s, errors="coerce").astype("float32")
+        else:
+            out[col] = pd.to_numeric(s, errors="coerce").round().astype(dtype)
+    return pd.DataFrame(out, index=df.index)
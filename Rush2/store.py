@@ -0,0 +1,88 @@
+# store.py
+"""Stockage colonnaire (Parquet) des ventes nettoyées, partitionné par granularité et année."""
+import shutil
+from pathlib import Path
+
+import pandas as pd
+
+from schema import SCHEMA, apply_schema
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    HAS_ARROW = True
+except ImportError:  # pyarrow absent : on reste sur les CSV
+    HAS_ARROW = False
+
+PARTITION_COLS = ["granularite", "annee"]
+
+
+def typed_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Types du schéma pour le stockage (voir schema.py) ; colonnes hors schéma en float64."""
+    typed = apply_schema(df)
+    for col in typed.columns:
+        if col not in SCHEMA:
+            typed[col] = pd.to_numeric(typed[col], errors="coerce").astype("float64")
+    typed["annee"] = typed["datum"].dt.year.astype("Int32")
+    return typed
+
+
+def write_store(df: pd.DataFrame, root: Path, basename: str = "part", overwrite: bool = True) -> bool:
+    """Écrit df dans root/granularite=<niveau>/annee=<année>/<basename>-<i>.parquet."""
+    if not HAS_ARROW:
+        return False
+    root = Path(root)
+    if overwrite and root.exists():
+        shutil.rmtree(root)
+    # sans métadonnées pandas : les clés de partition sont relues comme dictionnaires
+    table = pa.Table.from_pandas(typed_frame(df), preserve_index=False).replace_schema_metadata(None)
+    ds.write_dataset(
+        table,
+        root,
+        format="parquet",
+        partitioning=PARTITION_COLS,
+        partitioning_flavor="hive",
+        basename_template=basename + "-{i}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+    )
+    return True
+
+
+def store_exists(root: Path) -> bool:
+    return HAS_ARROW and Path(root).is_dir() and any(Path(root).glob("granularite=*"))
+
+
+def _dataset(root: Path):
+    return ds.dataset(Path(root), format="parquet", partitioning="hive")
+
+
+def store_columns(root: Path) -> list:
+    """Colonnes disponibles (hors clés de partition), sans lire les données."""
+    return [c for c in _dataset(root).schema.names if c not in PARTITION_COLS]
+
+
+def store_levels(root: Path) -> list:
+    return sorted(p.name.split("=", 1)[1] for p in Path(root).glob("granularite=*"))
+
+
+def read_store(root: Path, columns=None, levels=None, years=None) -> pd.DataFrame:
+    """Lecture avec élagage des colonnes et des partitions (granularités / années)."""
+    dataset = _dataset(root)
+    filt = None
+    if levels:
+        filt = ds.field("granularite").isin(list(levels))
+    if years:
+        f_years = ds.field("annee").isin([int(y) for y in years])
+        filt = f_years if filt is None else filt & f_years
+    table = dataset.to_table(columns=list(columns) if columns else None, filter=filt)
+    return table.to_pandas()
+
+
+def iter_store(root: Path, columns=None, levels=None, batch_rows: int = 500_000):
+    """Comme read_store, mais par lots de batch_rows lignes (mémoire bornée)."""
+    dataset = _dataset(root)
+    filt = ds.field("granularite").isin(list(levels)) if levels else None
+    for batch in dataset.to_batches(columns=list(columns) if columns else None, filter=filt,
+                                    batch_size=batch_rows):
+        if batch.num_rows:
+            yield batch.to_pandas()
@@ -0,0 +1,32 @@
+# test_registry.py
+"""python -m pytest test_registry.py"""
+import pytest
+
+from registry import DatasetRegistry
+
+
+class Value:
+    def nbytes(self) -> int:
+        return 1
+
+
+def test_failed_build_releases_key():
+    registry = DatasetRegistry()
+    calls = []
+
+    def build():
+        calls.append(None)
+        if len(calls) == 1:
+            raise ValueError("fichier illisible")
+        return Value()
+
+    with pytest.raises(ValueError):
+        registry.get_or_build("cle", build)
+    assert "cle" not in registry._building
+
+    value = registry.get_or_build("cle", build)
+    assert isinstance(value, Value)
+    assert len(calls) == 2
+    assert registry.get_or_build("cle", build) is value
+    assert registry.stats()["misses"] == 2
+    assert registry.stats()["hits"] == 1
@@ -0,0 +1,103 @@
+# upload.py
+"""Chargement progressif d'un fichier importé : un seul passage, sur un thread de fond.
+
+    job = UploadJob(data).start()
+    job.columns            # en-tête, lu sur les premiers octets avant le démarrage du thread
+    job.progress()         # (part des octets lus, lignes agrégées)
+    job.snapshot()         # Rollups des morceaux déjà lus (None avant le premier)
+
+Le dialecte (ingest.py) et le format de datum (query.iter_source_chunks) sont détectés sur le début
+du fichier ; chaque morceau est ensuite replié dans les agrégats, sans garder les lignes brutes.
+"""
+import io
+import threading
+
+from query import DATE_COL, KNOWN_PRODUCTS, iter_source_chunks
+from rollups import RollupBuilder
+
+import rootpath  # noqa: F401  (ingest.py, à la racine du dépôt)
+from ingest import read_csv, sniff_file
+
+CHUNK_ROWS = 100_000  # plus petit qu'à la lecture d'un fichier local : premiers graphiques plus tôt
+
+
+def read_upload_header(data: bytes) -> tuple:
+    """(dialecte, colonnes) d'un CSV en mémoire, lus sur ses premiers octets."""
+    dialect = sniff_file(io.BytesIO(data))
+    return dialect, read_csv(io.BytesIO(data), nrows=0, dialect=dialect).columns.tolist()
+
+
+class UploadJob:
+    """Agrégats d'un CSV en mémoire, construits morceau par morceau par un thread de fond."""
+
+    def __init__(self, data: bytes, chunk_rows: int = CHUNK_ROWS, header=None):
+        """header : (dialecte, colonnes) déjà lus par read_upload_header, sinon relus ici."""
+        self.data = data
+        self.chunk_rows = chunk_rows
+        self.dialect, self.columns = header or read_upload_header(data)
+        self.products = [c for c in KNOWN_PRODUCTS if c in self.columns]
+        self.hour_col = "Hour" if "Hour" in self.columns else None
+        self.usecols = [DATE_COL] + self.products + ([self.hour_col] if self.hour_col else [])
+        self.builder = RollupBuilder(DATE_COL, self.products, self.hour_col)
+        self.error = None
+        self._bytes_read = 0
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._snapshot = None
+        self._snapshot_rows = -1
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> "UploadJob":
+        """Lance le thread (une seule fois, appels suivants sans effet)."""
+        with self._lock:
+            if self._thread.is_alive() or self.done:
+                return self
+            if DATE_COL not in self.columns:
+                self._done.set()  # rien à agréger : l'appelant signale la colonne absente
+            else:
+                self._thread.start()
+        return self
+
+    def _run(self):
+        buf = io.BytesIO(self.data)
+        try:
+            for chunk in iter_source_chunks(uploaded=buf, usecols=self.usecols, date_col=DATE_COL,
+                                            chunk_rows=self.chunk_rows, dialect=self.dialect):
+                with self._lock:
+                    self.builder.add(chunk)
+                    self._bytes_read = buf.tell()
+            with self._lock:
+                self._bytes_read = len(self.data)  # fin du flux (le lecteur ne repasse pas par tell())
+        except Exception as e:  # remonté à l'interface (format de date ambigu, CSV illisible…)
+            self.error = e
+        finally:
+            self._done.set()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout=None) -> bool:
+        return self._done.wait(timeout)
+
+    def progress(self) -> tuple:
+        """(part des octets lus entre 0 et 1, lignes déjà agrégées)."""
+        with self._lock:
+            return min(1.0, self._bytes_read / max(1, len(self.data))), self.builder.rows
+
+    def snapshot(self):
+        """Rollups des lignes lues jusqu'ici, reconstruit seulement si de nouveaux morceaux sont arrivés."""
+        with self._lock:
+            if self.builder.rows == 0:
+                return None
+            if self.builder.rows != self._snapshot_rows:
+                self._snapshot = self.builder.build()
+                self._snapshot_rows = self.builder.rows
+            return self._snapshot
+
+    def result(self):
+        """Rollups complets (attend la fin du thread), pour le registre."""
+        self.wait()
+        if self.error is not None:
+            raise self.error
+        return self.snapshot() or self.builder.build()
@@ -1,18 +1,19 @@
-import pandas as pd
+from streamstats import scan_csv
 
-# 1. Chargement du fichier
-df = pd.read_csv('Credit Data_Fichier Clients.csv')
+# 1. Lecture du fichier en un passage par blocs (voir streamstats.py), sans le charger en mémoire
+stats = scan_csv('Credit Data_Fichier Clients.csv', chunksize=100_000)
 
 # 2. Analyse de la structure
-print(df.info())            # types de données et valeurs manquantes
-print(df.describe())        # statistiques descriptives des numériques
-print(df.describe(include='all'))  # inclut aussi les colonnes catégorielles
+print(f"{stats.rows} lignes, {len(stats.columns)} colonnes")
+print(stats.info())              # types de données et valeurs manquantes
+print(stats.describe())          # statistiques descriptives des numériques
+print(stats.describe_all())      # inclut aussi les colonnes catégorielles
 
 # 3. Statistiques complémentaires
-print(df['sex'].value_counts())
-print(df['education'].value_counts())
-print(df['product_type'].value_counts())
-print(df['family_status'].value_counts())
+print(stats.value_counts('sex'))
+print(stats.value_counts('education'))
+print(stats.value_counts('product_type'))
+print(stats.value_counts('family_status'))
 
 # 4. Vérification de la distribution de la variable cible
-print(df['bad_client_target'].value_counts(normalize=True))
+print(stats.value_counts('bad_client_target', normalize=True))
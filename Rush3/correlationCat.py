@@ -1,24 +1,19 @@
-import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 
-# 1. Chargement du fichier CSV
-df = pd.read_csv("Credit Data_Fichier Clients.csv")
+from profiler import profile
 
+# 1. Profil des taux de défaut : une lecture du CSV, un seul comptage pour toutes les variables (en cache)
 # 2. Liste des variables catégorielles à analyser
 categorical_vars = ['sex', 'education', 'product_type', 'family_status']
+prof = profile("Credit Data_Fichier Clients.csv", variables=categorical_vars)
 
-# 3. Boucle sur chaque variable pour calculer et afficher les taux de défaut
+# 3. Boucle sur chaque variable pour afficher les taux de défaut
 for var in categorical_vars:
     print(f"\n=== Analyse de la variable : {var} ===")
     
-    # Calcul des effectifs et taux de défaut
-    grouped = df.groupby(var)['bad_client_target'].agg(['count', 'sum', 'mean']).reset_index()
-    grouped.rename(columns={
-        'count': 'Nombre_total',
-        'sum': 'Mauvais_payeurs',
-        'mean': 'Taux_de_defaut'
-    }, inplace=True)
+    # Effectifs et taux de défaut déjà calculés par le profil
+    grouped = prof.of(var)
     
     print(grouped)
     
@@ -31,3 +26,6 @@ for var in categorical_vars:
     plt.xticks(rotation=45)
     plt.tight_layout()
     plt.show()
+
+# 5. Force de la liaison avec la cible (V de Cramér, valeur d'information)
+print(prof.summary.to_string(index=False))
@@ -1,21 +1,20 @@
-import pandas as pd
-
-# Charger les données
-df = pd.read_csv("Credit Data_Fichier Clients.csv")
-TARGET = "bad_client_target"
+from profiler import TARGET, profile
 
+# Profil des taux de défaut, calculé en un passage et mis en cache (voir profiler.py)
 # Détection automatique des variables catégorielles :
 # - colonnes de type 'object'
 # - colonnes numériques avec peu de valeurs uniques (par exemple ≤ 20)
-cat_vars = list(df.select_dtypes(include=["object"]).columns)
-low_card_num = [c for c in df.select_dtypes(include=["int64", "float64"]).columns 
-                if c != TARGET and df[c].nunique() <= 20]
-categorical_vars = cat_vars + low_card_num
+prof = profile("Credit Data_Fichier Clients.csv", target=TARGET, max_levels=20)
+categorical_vars = prof.variables
 
 print("Variables catégorielles détectées :", categorical_vars)
 
 # Boucle sur chaque variable catégorielle
 for var in categorical_vars:
     print(f"\n=== Taux de défaut par modalité pour '{var}' ===")
-    taux_defaut = df.groupby(var)[TARGET].mean().sort_values(ascending=False)
+    taux_defaut = prof.of(var).set_index(var)["Taux_de_defaut"].rename(TARGET).sort_values(ascending=False)
     print(taux_defaut)
+
+# Classement des variables par valeur d'information
+print("\n=== Liaison avec la cible ===")
+print(prof.summary.sort_values("iv", ascending=False).to_string(index=False))
@@ -3,22 +3,25 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 
-# 2. Chargement du fichier CSV
-df = pd.read_csv("Credit Data_Fichier Clients.csv")
+from streamstats import scan_csv
+
+# 2. Chargement du fichier CSV : un passage par blocs, covariances accumulées (voir streamstats.py)
+path = "Credit Data_Fichier Clients.csv"
+stats = scan_csv(path, chunksize=100_000)
 
 # 3. Afficher les premières lignes pour vérifier la structure
 print("Aperçu des données :")
-print(df.head())
+print(pd.read_csv(path, nrows=5))
 
 # 4. Sélection des variables numériques pour la corrélation
 # On exclut les colonnes catégorielles (texte)
-numeric_cols = df.select_dtypes(include=['int64', 'float64'])
+numeric_cols = pd.Index(stats.numeric)
 
 print("\nVariables numériques utilisées pour la corrélation :")
-print(numeric_cols.columns)
+print(numeric_cols)
 
 # 5. Calcul de la matrice de corrélation
-corr_matrix = numeric_cols.corr()
+corr_matrix = stats.corr()
 
 print("\nMatrice de corrélation :")
 print(corr_matrix)
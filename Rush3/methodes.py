@@ -1,16 +1,51 @@
 from tkinter import *
-import pandas as pd
-import matplotlib.pyplot as plt
-from scipy import stats
-from sklearn.neighbors import KNeighborsClassifier
+import queue
+import threading
+
 import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+from scoring import DATA_PATH, load_model
+from tuning import cached_recommendation
+
+# --- Calculs sur un thread de travail : la fenêtre reste réactive pendant le chargement et le scoring ---
+jobs = queue.Queue()      # demandes de l'interface -> worker
+results = queue.Queue()   # résultats du worker -> interface (lus par poll_results)
+POLL_MS = 50
+
+
+def worker():
+    # Chargement unique du fichier CSV, KD-tree et droite de régression (voir scoring.py)
+    try:
+        model = load_model(DATA_PATH)
+    except Exception as e:
+        results.put(("erreur", f"Chargement impossible : {e}"))
+        return
+    results.put(("modele", model))
+    # k conseillé par tuning.py, seulement si l'évaluation est déjà en cache
+    try:
+        results.put(("k_conseille", cached_recommendation(DATA_PATH)))
+    except Exception:
+        pass
+    while True:
+        job = jobs.get()
+        if job is None:
+            return
+        method, new_x, new_y, k = job
+        try:
+            if method == "regre_linear":
+                results.put(("regre_linear", new_x, float(model.predict_income(new_x)), None))
+            else:
+                scores = model.score([(new_x, new_y)], k)
+                results.put(("knn", new_x, new_y, (int(scores.prediction[0]), float(scores.default_rate[0]))))
+        except ValueError as e:
+            results.put(("erreur", str(e)))
 
-# --- Chargement unique du fichier CSV ---
-df = pd.read_csv('Credit Data_Fichier Clients.csv')
 
 root = Tk()
 root.title("Prédiction Crédit")
-root.geometry("400x200")
+root.geometry("820x720")
 
 Label(root, text="Méthode de prédiction").grid(row=0, column=0, padx=10, pady=5)
 method_var = StringVar(value="regre_linear")
@@ -29,57 +64,113 @@ Label(root, text="Nombre k").grid(row=3, column=0, padx=10, pady=5)
 nbk_entry = Entry(root)
 nbk_entry.grid(row=3, column=1, padx=10, pady=5)
 
-def submit_form():
-    if method_var.get() == "regre_linear":
-        # Lecture des variables nécessaires
-        x = df['credit_amount'].to_numpy()
-        y = df['income'].to_numpy()
-
-        slope, intercept, r, p, std_err = stats.linregress(x, y)
+status_var = StringVar(value="Chargement des clients…")
+Label(root, textvariable=status_var).grid(row=5, columnspan=3)
+
+# --- Graphique intégré : nuage des clients dessiné une fois, seul le nouveau point est redessiné ---
+# (blitting : droite, point et légende sont « animés », hors du fond copié après chaque dessin complet)
+fig = Figure(figsize=(8, 5))
+ax = fig.add_subplot()
+ax.set_xlabel("credit_amount")
+ax.set_ylabel("income")
+canvas = FigureCanvasTkAgg(fig, master=root)
+canvas.get_tk_widget().grid(row=6, columnspan=3, padx=10, pady=5)
+reg_line, = ax.plot([], [], color='orange', visible=False, animated=True)
+new_point = ax.scatter([], [], s=100, edgecolors='black', zorder=3, animated=True)
+background = None  # axes sans les artistes animés, copié à chaque dessin complet
+
+
+def draw_animated():
+    for artist in (reg_line, new_point, ax.get_legend()):
+        if artist is not None and artist.get_visible():
+            ax.draw_artist(artist)
+
+
+def on_draw(event):
+    """Dessin complet (premier affichage, nuage des clients, redimensionnement) : nouveau fond."""
+    global background
+    background = canvas.copy_from_bbox(ax.bbox)
+    draw_animated()
+
+
+canvas.mpl_connect("draw_event", on_draw)
+
+
+def draw_clients(model):
+    x, y = model.X[:, 0], model.X[:, 1]
+    ax.scatter(x, y, c=model.y, cmap='coolwarm', alpha=0.6)
+    # droite tracée sur ses deux extrémités, pas sur chaque client
+    ends = np.array([x.min(), x.max()])
+    reg_line.set_data(ends, model.predict_income(ends))
+    canvas.draw()  # seul dessin complet : le fond est prêt avant le premier point
+
+
+def show_point(method, new_x, new_y, label, color):
+    new_point.set_offsets([[new_x, new_y]])
+    new_point.set_facecolor(color)
+    new_point.set_label(label)
+    reg_line.set_visible(method == "regre_linear")
+    ax.legend(handles=[new_point]).set_animated(True)
+    if background is None:
+        canvas.draw()
+        return
+    canvas.restore_region(background)
+    draw_animated()
+    canvas.blit(ax.bbox)
+
+
+def poll_results():
+    try:
+        while True:
+            kind, *payload = results.get_nowait()
+            if kind == "modele":
+                draw_clients(payload[0])
+                submit_button.config(state=NORMAL)
+                status_var.set(f"{len(payload[0])} clients chargés")
+            elif kind == "k_conseille":
+                if payload[0] is not None and not nbk_entry.get():
+                    nbk_entry.insert(0, str(payload[0]))
+                    status_var.set(f"{status_var.get()} — k conseillé : {payload[0]} (tuning.py)")
+            elif kind == "regre_linear":
+                new_x, new_y, _ = payload
+                show_point(kind, new_x, new_y, f"Nouveau point ({new_x},{int(new_y)})", 'red')
+                status_var.set("")
+            elif kind == "knn":
+                new_x, new_y, (prediction, rate) = payload
+                show_point(kind, new_x, new_y, f"Classe prédite: {prediction}", 'green')
+                status_var.set(f"Taux de défaut des voisins : {rate:.0%}")
+            else:
+                status_var.set(payload[0])
+    except queue.Empty:
+        pass
+    root.after(POLL_MS, poll_results)
 
-        def myfunc(val):
-            return slope * val + intercept
-
-        # Nouveau point
-        new_x = int(abs_entry.get())
-        new_y = myfunc(new_x)
-
-        # Affichage
-        plt.scatter(x, y)
-        plt.scatter(new_x, new_y, color='red', label=f"Nouveau point ({new_x},{int(new_y)})")
-        plt.plot(x, list(map(myfunc, x)), color='orange')
-        plt.xlabel("credit_amount")
-        plt.ylabel("income")
-        plt.legend()
-        plt.show()
-
-    elif method_var.get() == "knn":
-        x = df['credit_amount'].to_numpy().flatten()
-        y = df['income'].to_numpy().flatten()
-        classes = df['bad_client_target'].to_numpy().flatten()
-
-        data = list(zip(x, y))
-        k = int(nbk_entry.get())
-        knn = KNeighborsClassifier(n_neighbors=k)
-        knn.fit(data, classes)
 
+def submit_form():
+    method = method_var.get()
+    try:
         new_x = int(abs_entry.get())
-        new_y = int(ord_entry.get())
-        new_point = [(new_x, new_y)]
-
-        prediction = knn.predict(new_point)
+        new_y = int(ord_entry.get()) if method == "knn" else None
+        k = int(nbk_entry.get()) if method == "knn" else None
+    except ValueError:
+        status_var.set("Saisir des nombres entiers")
+        return
+    if method not in ("regre_linear", "knn"):
+        print("Erreur dans la sélection")
+        return
+    status_var.set("Calcul…")
+    jobs.put((method, new_x, new_y, k))
 
-        plt.scatter(x, y, c=classes, cmap='coolwarm', alpha=0.6)
-        plt.scatter(new_x, new_y, c='green', edgecolors='black', s=100, label=f"Classe prédite: {prediction[0]}")
-        plt.xlabel("credit_amount")
-        plt.ylabel("income")
-        plt.legend()
-        plt.show()
 
-    else:
-        print("Erreur dans la sélection")
+def on_close():
+    jobs.put(None)
+    root.destroy()
 
 
-Button(root, text="Submit", command=submit_form).grid(row=4, columnspan=2, pady=20)
+submit_button = Button(root, text="Submit", command=submit_form, state=DISABLED)
+submit_button.grid(row=4, columnspan=2, pady=20)
 
+threading.Thread(target=worker, daemon=True).start()
+root.protocol("WM_DELETE_WINDOW", on_close)
+root.after(POLL_MS, poll_results)
 root.mainloop()
@@ -0,0 +1,140 @@
+# profiler.py
+"""Taux de défaut par modalité pour toutes les variables catégorielles, en une lecture et un bincount.
+
+    from profiler import profile
+    prof = profile("Credit Data_Fichier Clients.csv")
+    prof.summary          # une ligne par variable : modalités, V de Cramér, valeur d'information
+    prof.of("education")  # effectif, mauvais payeurs et taux de défaut par modalité
+
+Chaque variable est encodée en entiers (factorize) ; les codes de toutes les variables sont décalés
+dans un même espace et comptés par un seul np.bincount (effectifs, puis sommes de la cible).
+Résultat mis en cache sur disque, clé : empreinte du fichier et paramètres.
+"""
+import hashlib
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import rootpath  # noqa: F401  (ingest.py, à la racine du dépôt)
+from ingest import read_csv
+
+DATA_PATH = Path("Credit Data_Fichier Clients.csv")
+TARGET = "bad_client_target"
+MAX_LEVELS = 20  # variables numériques avec au plus MAX_LEVELS valeurs traitées comme catégorielles
+CACHE_DIR = Path(".cache_profil")
+IV_SMOOTHING = 0.5  # ajouté aux cases vides (modalité sans bon ou sans mauvais payeur)
+
+
+@dataclass
+class CategoricalProfile:
+    table: pd.DataFrame    # variable, modalite, Nombre_total, Mauvais_payeurs, Taux_de_defaut
+    summary: pd.DataFrame  # variable, modalites, cramers_v, iv
+    rows: int
+
+    @property
+    def variables(self) -> list:
+        return self.summary["variable"].tolist()
+
+    def of(self, var: str) -> pd.DataFrame:
+        """Même tableau que groupby(var)[TARGET].agg(['count', 'sum', 'mean']), colonnes renommées."""
+        part = self.table[self.table["variable"] == var]
+        return part.drop(columns="variable").rename(columns={"modalite": var}).reset_index(drop=True)
+
+
+def detect_categoricals(df: pd.DataFrame, target: str = TARGET, max_levels: int = MAX_LEVELS) -> list:
+    """Colonnes texte, puis colonnes numériques à faible cardinalité (hors cible)."""
+    cat_vars = list(df.select_dtypes(include=["object"]).columns)
+    low_card = [c for c in df.select_dtypes(include=["int64", "float64"]).columns
+                if c != target and len(pd.unique(df[c].dropna())) <= max_levels]
+    return cat_vars + low_card
+
+
+def profile_frame(df: pd.DataFrame, variables=None, target: str = TARGET,
+                  max_levels: int = MAX_LEVELS) -> CategoricalProfile:
+    variables = list(variables) if variables is not None else detect_categoricals(df, target, max_levels)
+    y = df[target].to_numpy(dtype="float64")
+    has_y = ~np.isnan(y)
+
+    # encodage entier de chaque variable, codes décalés dans un espace commun
+    codes, uniques, offsets = [], [], [0]
+    for var in variables:
+        c, u = pd.factorize(df[var], sort=True)  # NaN -> -1, écarté comme dans groupby
+        codes.append(np.where((c >= 0) & has_y, c + offsets[-1], -1))
+        uniques.append(u)
+        offsets.append(offsets[-1] + len(u))
+    flat = np.concatenate(codes) if codes else np.empty(0, dtype="int64")
+    keep = flat >= 0
+    weights = np.tile(np.where(has_y, y, 0.0), len(variables))[keep]
+    counts = np.bincount(flat[keep], minlength=offsets[-1])
+    bad = np.bincount(flat[keep], weights=weights, minlength=offsets[-1])
+    if pd.api.types.is_integer_dtype(df[target]):
+        bad = bad.astype("int64")
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rate = bad / counts
+    table = pd.DataFrame({
+        "variable": np.repeat(variables, [len(u) for u in uniques]),
+        "modalite": np.concatenate([np.asarray(u, dtype=object) for u in uniques]) if uniques else [],
+        "Nombre_total": counts,
+        "Mauvais_payeurs": bad,
+        "Taux_de_defaut": rate,
+    })
+
+    summary = []
+    for var, lo, hi in zip(variables, offsets[:-1], offsets[1:]):
+        summary.append({"variable": var, "modalites": hi - lo,
+                        "cramers_v": cramers_v(counts[lo:hi], bad[lo:hi]),
+                        "iv": information_value(counts[lo:hi], bad[lo:hi])})
+    summary = pd.DataFrame(summary, columns=["variable", "modalites", "cramers_v", "iv"])
+    return CategoricalProfile(table, summary, len(df))
+
+
+def cramers_v(counts: np.ndarray, bad: np.ndarray) -> float:
+    """V de Cramér du tableau modalités × (bon, mauvais), depuis les effectifs."""
+    n = counts.sum()
+    if n == 0 or len(counts) < 2:
+        return np.nan
+    observed = np.stack([counts - bad, bad])
+    expected = observed.sum(axis=1, keepdims=True) * counts / n
+    with np.errstate(invalid="ignore", divide="ignore"):
+        chi2 = np.nansum((observed - expected) ** 2 / expected)
+    return float(np.sqrt(chi2 / n))  # min(2, modalités) - 1 = 1
+
+
+def information_value(counts: np.ndarray, bad: np.ndarray) -> float:
+    good = counts - bad
+    if good.sum() == 0 or bad.sum() == 0:
+        return np.nan
+    g = (good + IV_SMOOTHING * (good == 0)) / good.sum()
+    b = (bad + IV_SMOOTHING * (bad == 0)) / bad.sum()
+    return float(np.sum((g - b) * np.log(g / b)))
+
+
+def _cache_key(path: Path, variables, target: str, max_levels: int) -> str:
+    st = os.stat(path)
+    raw = repr((str(Path(path).resolve()), st.st_size, st.st_mtime_ns, variables, target, max_levels))
+    return hashlib.sha256(raw.encode()).hexdigest()[:16]
+
+
+def profile(path=DATA_PATH, variables=None, target: str = TARGET, max_levels: int = MAX_LEVELS,
+            cache_dir=CACHE_DIR) -> CategoricalProfile:
+    """Profil d'un fichier CSV, relu seulement si le fichier ou les paramètres ont changé."""
+    cache = None
+    if cache_dir is not None:
+        cache = Path(cache_dir) / f"{_cache_key(path, variables, target, max_levels)}.pkl"
+        if cache.exists():
+            return pd.read_pickle(cache)
+    result = profile_frame(read_csv(path), variables, target, max_levels)
+    if cache is not None:
+        cache.parent.mkdir(exist_ok=True)
+        pd.to_pickle(result, cache)
+    return result
+
+
+if __name__ == "__main__":
+    prof = profile()
+    print(f"{prof.rows} lignes")
+    print(prof.summary.sort_values("iv", ascending=False).to_string(index=False))
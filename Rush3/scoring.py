@@ -0,0 +1,132 @@
+# scoring.py
+"""Moteur de prédiction crédit : modèle ajusté une fois par fichier clients, scoring vectorisé par lots.
+
+    python3 scoring.py demandes.csv --k 5 --out scores.csv
+
+Le KD-tree sur (credit_amount, income) ne dépend pas de k : un seul index par fichier clients,
+interrogé avec le k demandé. Les axes ne sont pas normalisés, comme le KNN de methodes.py.
+"""
+import argparse
+import os
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import KDTree
+
+import rootpath  # noqa: F401  (ingest.py, à la racine du dépôt)
+from ingest import read_csv
+
+DATA_PATH = Path("Credit Data_Fichier Clients.csv")
+FEATURES = ["credit_amount", "income"]
+TARGET = "bad_client_target"
+CHUNK_ROWS = 100_000
+
+
+@dataclass
+class Scores:
+    """Résultat d'un lot : une ligne par demandeur, k colonnes pour les voisins."""
+
+    prediction: np.ndarray    # classe prédite (vote majoritaire, égalité -> 0 comme KNeighborsClassifier)
+    default_rate: np.ndarray  # part de mauvais payeurs parmi les k voisins
+    distances: np.ndarray     # (n, k), voisins du plus proche au plus lointain
+    indices: np.ndarray       # (n, k), lignes du fichier clients
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame({
+            "prediction": self.prediction,
+            "taux_defaut": self.default_rate,
+            "distance_min": self.distances[:, 0],
+            "distance_moyenne": self.distances.mean(axis=1),
+            "distance_max": self.distances[:, -1],
+        })
+
+
+class CreditModel:
+    """KD-tree des clients et droite income ~ credit_amount, calculés une fois."""
+
+    def __init__(self, X: np.ndarray, y: np.ndarray):
+        self.X = np.ascontiguousarray(X, dtype="float64")
+        self.y = np.asarray(y, dtype="int8")
+        self.tree = KDTree(self.X)
+        # moindres carrés fermés, mêmes pente / ordonnée que stats.linregress
+        x, v = self.X[:, 0], self.X[:, 1]
+        dx = x - x.mean()
+        self.slope = float(dx @ (v - v.mean()) / (dx @ dx))
+        self.intercept = float(v.mean() - self.slope * x.mean())
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "CreditModel":
+        df = df.dropna(subset=FEATURES + [TARGET])
+        return cls(df[FEATURES].to_numpy(), df[TARGET].to_numpy())
+
+    def __len__(self) -> int:
+        return len(self.y)
+
+    def predict_income(self, credit_amount) -> np.ndarray:
+        return self.slope * np.asarray(credit_amount, dtype="float64") + self.intercept
+
+    def score(self, points, k: int) -> Scores:
+        """Scoring d'un lot de points (n, 2) en un seul appel au KD-tree."""
+        points = np.atleast_2d(np.asarray(points, dtype="float64"))
+        if not 1 <= k <= len(self):
+            raise ValueError(f"k doit être compris entre 1 et {len(self)}")
+        distances, indices = self.tree.query(points, k=k)
+        rate = self.y[indices].mean(axis=1)
+        return Scores((rate > 0.5).astype("int8"), rate, distances, indices)
+
+
+def _fingerprint(path: Path) -> tuple:
+    st = os.stat(path)
+    return str(Path(path).resolve()), st.st_size, st.st_mtime_ns
+
+
+@lru_cache(maxsize=4)
+def _load(key: tuple) -> CreditModel:
+    return CreditModel.from_frame(read_csv(key[0], usecols=FEATURES + [TARGET]))
+
+
+def load_model(path=DATA_PATH) -> CreditModel:
+    """Modèle du fichier clients, réutilisé tant que le fichier ne change pas (taille, mtime)."""
+    return _load(_fingerprint(path))
+
+
+def score_file(model: CreditModel, src, k: int, out=None, chunk_rows: int = CHUNK_ROWS) -> pd.DataFrame:
+    """Score un fichier de demandeurs (colonnes credit_amount, income) par blocs de chunk_rows lignes.
+
+    Les colonnes d'origine sont conservées ; les lignes incomplètes restent sans score.
+    """
+    parts = []
+    for chunk in read_csv(src, chunksize=chunk_rows):
+        ok = chunk[FEATURES].notna().all(axis=1).to_numpy()
+        scored = model.score(chunk.loc[ok, FEATURES].to_numpy(), k).to_frame()
+        scored.index = chunk.index[ok]
+        parts.append(chunk.join(scored))
+    result = pd.concat(parts) if parts else pd.DataFrame()
+    if out is not None:
+        result.to_csv(out, index=False)
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scoring KNN d'un fichier de demandeurs.")
+    parser.add_argument("applicants", type=Path, help="CSV avec les colonnes credit_amount et income")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--data", type=Path, default=DATA_PATH, help="fichier clients de référence")
+    parser.add_argument("--out", type=Path, default=None, help="CSV de sortie (défaut : <demandes>_scores.csv)")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    model = load_model(args.data)
+    t1 = time.perf_counter()
+    out = args.out or args.applicants.with_name(args.applicants.stem + "_scores.csv")
+    result = score_file(model, args.applicants, args.k, out, args.chunk_rows)
+    t2 = time.perf_counter()
+    print(f"Modèle : {len(model)} clients ({t1 - t0:.2f}s)")
+    print(f"Scoring : {len(result)} demandes, k={args.k} ({t2 - t1:.2f}s) -> {out}")
+    if len(result):
+        print(f"Taux de défaut moyen estimé : {result['taux_defaut'].mean():.3f}")
@@ -0,0 +1,300 @@
+# streamstats.py
+"""Statistiques d'un CSV en un passage par blocs, fusionnables entre blocs et entre processus.
+
+    python3 streamstats.py "Credit Data_Fichier Clients.csv" --chunksize 100000 --jobs 4
+
+    stats = scan_csv(path)
+    stats.info()                      # type, valeurs non nulles et manquantes par colonne
+    stats.describe()                  # comme df.describe() ; quantiles exacts tant que la colonne
+                                      # a au plus MAX_CENTROIDS valeurs distinctes, approchés au-delà
+    stats.value_counts("education")   # comptages exacts des colonnes texte
+    stats.corr()                      # Pearson, observations complètes par paire, comme df.corr()
+
+Moyennes, variances et corrélations viennent des mêmes sommes (effectifs, Σx, Σx², Σxy par paire
+de colonnes), accumulées sur des valeurs décalées d'une constante par colonne pour rester précises.
+"""
+import argparse
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import rootpath  # noqa: F401  (ingest.py, à la racine du dépôt)
+from ingest import read_csv, sniff, split_ranges
+
+DATA_PATH = Path("Credit Data_Fichier Clients.csv")
+CHUNK_ROWS = 100_000
+MAX_CENTROIDS = 2048
+PIECE_BYTES = 16 * 1024 * 1024
+SNIFF_ROWS = 1000
+QUANTILES = (0.25, 0.5, 0.75)
+
+
+class QuantileSketch:
+    """Couples (valeur, poids) triés : exacts tant qu'il y a au plus max_size valeurs distinctes,
+    puis regroupés en max_size centroïdes de poids égaux."""
+
+    def __init__(self, max_size: int = MAX_CENTROIDS):
+        self.max_size = max_size
+        self.values = np.empty(0)
+        self.weights = np.empty(0)
+        self.exact = True
+
+    def update(self, x: np.ndarray):
+        x = x[~np.isnan(x)]
+        if len(x):
+            values, counts = np.unique(x, return_counts=True)
+            self._absorb(values, counts.astype("float64"))
+
+    def merge(self, other: "QuantileSketch"):
+        self.exact &= other.exact
+        self._absorb(other.values, other.weights)
+
+    def _absorb(self, values: np.ndarray, weights: np.ndarray):
+        values, inverse = np.unique(np.concatenate([self.values, values]), return_inverse=True)
+        weights = np.bincount(inverse, weights=np.concatenate([self.weights, weights]))
+        if len(values) > self.max_size:
+            # groupes de poids cumulé égal, centroïde = moyenne pondérée
+            cum = np.cumsum(weights)
+            group = np.minimum(((cum - weights / 2) / cum[-1] * self.max_size).astype("int64"), self.max_size - 1)
+            w = np.bincount(group, weights=weights)
+            v = np.bincount(group, weights=weights * values)
+            keep = w > 0
+            values, weights = v[keep] / w[keep], w[keep]
+            self.exact = False
+        self.values, self.weights = values, weights
+
+    def quantile(self, q: float) -> float:
+        n = self.weights.sum()
+        if n == 0:
+            return np.nan
+        cum = np.cumsum(self.weights)
+        if self.exact:
+            # interpolation linéaire entre rangs, comme Series.quantile
+            h = (n - 1) * q
+            lo = int(np.floor(h))
+            at = lambda r: self.values[np.searchsorted(cum, r, side="right")]
+            return float(at(lo) + (h - lo) * (at(min(lo + 1, n - 1)) - at(lo)))
+        return float(np.interp(q * n, cum - self.weights / 2, self.values))
+
+
+class StreamStats:
+    """Accumulateur par blocs ; merge() combine deux accumulateurs construits sur des lignes disjointes."""
+
+    def __init__(self, count_cols=None, max_centroids: int = MAX_CENTROIDS, shift=None):
+        self.count_cols = count_cols  # None : toutes les colonnes non numériques
+        self.max_centroids = max_centroids
+        self.shift_hint = shift
+        self.columns = None
+        self.rows = 0
+
+    def _init(self, chunk: pd.DataFrame):
+        self.columns = list(chunk.columns)
+        self.dtypes = {c: chunk[c].dtype for c in self.columns}
+        self.numeric = [c for c in self.columns if pd.api.types.is_numeric_dtype(chunk[c])]
+        if self.count_cols is None:
+            self.count_cols = [c for c in self.columns if c not in self.numeric]
+        p = len(self.numeric)
+        hint = pd.Series(self.shift_hint if self.shift_hint is not None else chunk[self.numeric].mean())
+        self.shift = hint.reindex(self.numeric).fillna(0.0).to_numpy(dtype="float64")
+        self.missing = pd.Series(0, index=self.columns, dtype="int64")
+        self.n = np.zeros((p, p))
+        self.sx = np.zeros((p, p))   # sx[i, j] : Σ x_i sur les lignes où i et j sont présents
+        self.sxx = np.zeros((p, p))  # sxx[i, j] : Σ x_i²  sur ces mêmes lignes
+        self.sxy = np.zeros((p, p))  # sxy[i, j] : Σ x_i x_j
+        self.mins = np.full(p, np.inf)
+        self.maxs = np.full(p, -np.inf)
+        self.sketches = [QuantileSketch(self.max_centroids) for _ in range(p)]
+        self.counts = {c: pd.Series(dtype="int64") for c in self.count_cols}
+
+    def update(self, chunk: pd.DataFrame) -> "StreamStats":
+        if self.columns is None:
+            self._init(chunk)
+        self.rows += len(chunk)
+        self.missing += chunk.isna().sum().reindex(self.columns, fill_value=0)
+        for c in self.columns:
+            self.dtypes[c] = _promote(self.dtypes[c], chunk[c].dtype)
+
+        # valeurs non numériques d'une colonne numérique : manquantes pour les moments
+        X = chunk[self.numeric].apply(pd.to_numeric, errors="coerce").to_numpy(dtype="float64")
+        raw = X
+        X = X - self.shift
+        present = ~np.isnan(X)
+        X0 = np.where(present, X, 0.0)
+        M = present.astype("float64")
+        self.n += M.T @ M
+        self.sx += X0.T @ M
+        self.sxx += (X0 * X0).T @ M
+        self.sxy += X0.T @ X0
+        self.mins = np.fmin(self.mins, np.where(present, raw, np.inf).min(axis=0, initial=np.inf))
+        self.maxs = np.fmax(self.maxs, np.where(present, raw, -np.inf).max(axis=0, initial=-np.inf))
+        for j, sketch in enumerate(self.sketches):
+            sketch.update(raw[:, j])
+
+        for c in self.count_cols:
+            self.counts[c] = _add_counts(self.counts[c], chunk[c].value_counts())
+        return self
+
+    def merge(self, other: "StreamStats") -> "StreamStats":
+        if other.columns is None:
+            return self
+        if self.columns is None:
+            self.__dict__.update(other.__dict__)
+            return self
+        if other.numeric != self.numeric:
+            raise ValueError("colonnes numériques différentes : blocs de fichiers différents ?")
+        # sommes de l'autre accumulateur ré-exprimées avec le décalage de celui-ci
+        d = other.shift - self.shift
+        di, dj = d[:, None], d[None, :]
+        self.sxy += other.sxy + dj * other.sx + di * other.sx.T + di * dj * other.n
+        self.sxx += other.sxx + 2 * di * other.sx + di * di * other.n
+        self.sx += other.sx + di * other.n
+        self.n += other.n
+        self.mins = np.fmin(self.mins, other.mins)
+        self.maxs = np.fmax(self.maxs, other.maxs)
+        for mine, theirs in zip(self.sketches, other.sketches):
+            mine.merge(theirs)
+        for c in self.count_cols:
+            self.counts[c] = _add_counts(self.counts[c], other.counts.get(c, pd.Series(dtype="int64")))
+        self.missing = self.missing.add(other.missing, fill_value=0).astype("int64")
+        for c in self.columns:
+            self.dtypes[c] = _promote(self.dtypes[c], other.dtypes[c])
+        self.rows += other.rows
+        return self
+
+    # === Rapports ===
+
+    def info(self) -> pd.DataFrame:
+        return pd.DataFrame({
+            "Non-Null Count": self.rows - self.missing,
+            "Missing": self.missing,
+            "Dtype": pd.Series(self.dtypes).astype(str),
+        }).rename_axis("Column")
+
+    def describe(self) -> pd.DataFrame:
+        diag = np.arange(len(self.numeric))
+        n = self.n[diag, diag]
+        sx, sxx = self.sx[diag, diag], self.sxx[diag, diag]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = self.shift + sx / n
+            std = np.sqrt(np.maximum(sxx - sx * sx / n, 0) / (n - 1))
+        rows = {"count": n, "mean": mean, "std": std, "min": np.where(n > 0, self.mins, np.nan)}
+        for q in QUANTILES:
+            rows[f"{q:.0%}"] = [s.quantile(q) for s in self.sketches]
+        rows["max"] = np.where(n > 0, self.maxs, np.nan)
+        return pd.DataFrame(rows, index=self.numeric).T
+
+    def describe_all(self) -> pd.DataFrame:
+        """Comme df.describe(include='all') : count / unique / top / freq pour les colonnes texte."""
+        text = {}
+        for c in self.count_cols:
+            vc = self.value_counts(c)
+            text[c] = {"count": self.rows - self.missing[c], "unique": len(vc),
+                       "top": vc.index[0] if len(vc) else np.nan, "freq": vc.iloc[0] if len(vc) else np.nan}
+        num = self.describe()
+        out = pd.concat([pd.DataFrame(text), num], axis=1)
+        order = ["count", "unique", "top", "freq"] + [r for r in num.index if r != "count"]
+        return out.reindex(index=order, columns=[c for c in self.columns if c in out.columns])
+
+    def value_counts(self, col: str, normalize: bool = False) -> pd.Series:
+        if col not in self.counts:
+            # colonne numérique : comptages exacts tant que l'esquisse n'a pas été compressée
+            j = self.numeric.index(col)
+            sketch = self.sketches[j]
+            if not sketch.exact:
+                raise ValueError(f"{col} : plus de {self.max_centroids} valeurs distinctes, comptage non conservé")
+            counts = pd.Series(sketch.weights.astype("int64"), index=sketch.values)
+            if pd.api.types.is_integer_dtype(self.dtypes[col]):
+                counts.index = counts.index.astype("int64")
+        else:
+            counts = self.counts[col]
+        counts = counts.sort_values(ascending=False, kind="stable").rename_axis(col)
+        if normalize:
+            return (counts / counts.sum()).rename("proportion")
+        return counts.rename("count")
+
+    def corr(self) -> pd.DataFrame:
+        """Pearson sur les observations complètes de chaque paire (df.corr())."""
+        n, sx, sxx, sxy = self.n, self.sx, self.sxx, self.sxy
+        with np.errstate(invalid="ignore", divide="ignore"):
+            cov = sxy - sx * sx.T / n
+            var_i = sxx - sx * sx / n
+            r = cov / np.sqrt(var_i * var_i.T)
+        r = np.clip(r, -1, 1)
+        np.fill_diagonal(r, np.where(np.diag(var_i) > 0, 1.0, np.nan))
+        return pd.DataFrame(r, index=self.numeric, columns=self.numeric)
+
+
+def _add_counts(a: pd.Series, b: pd.Series) -> pd.Series:
+    if a.empty:
+        return b.astype("int64")
+    # ordre de première apparition conservé
+    return pd.concat([a, b]).groupby(level=0, sort=False).sum().astype("int64")
+
+
+def _promote(a, b):
+    if a == b:
+        return a
+    if pd.api.types.is_numeric_dtype(a) and pd.api.types.is_numeric_dtype(b):
+        return np.result_type(a, b)
+    return np.dtype("object")
+
+
+# === Lecture ===
+
+def _scan_range(task: dict) -> StreamStats:
+    """Tâche d'un processus : accumulateur sur les octets [start, end) du fichier."""
+    with open(task["path"], "rb") as f:
+        f.seek(task["start"])
+        data = f.read(task["end"] - task["start"])
+    stats = StreamStats(task["count_cols"], task["max_centroids"], task["shift"])
+    for chunk in pd.read_csv(io.BytesIO(data), header=None, names=task["columns"], dtype=task["dtypes"],
+                             chunksize=task["chunksize"], **task["options"]):
+        stats.update(chunk)
+    return stats
+
+
+def scan_csv(path=DATA_PATH, chunksize: int = CHUNK_ROWS, jobs: int = 1, count_cols=None,
+             max_centroids: int = MAX_CENTROIDS, piece_bytes: int = PIECE_BYTES) -> StreamStats:
+    """Un passage sur le fichier, par blocs de chunksize lignes ; jobs > 1 : tranches réparties
+    sur un pool de processus, accumulateurs fusionnés à la fin."""
+    path = Path(path)
+    # colonnes, types et décalages fixés sur un échantillon, communs à tous les blocs
+    dialect = sniff(path)
+    head = read_csv(path, nrows=SNIFF_ROWS, dialect=dialect)
+    shift = head.select_dtypes("number").mean()
+    if jobs <= 1:
+        stats = StreamStats(count_cols, max_centroids, shift)
+        for chunk in read_csv(path, chunksize=chunksize, dialect=dialect):
+            stats.update(chunk)
+        return stats
+
+    with open(path, "rb") as f:
+        f.readline()
+        start = f.tell()
+    # mêmes types dans tous les processus : texte lu en texte même si une tranche ressemble à un nombre
+    dtypes = {c: "object" for c in head.columns if c not in shift.index}
+    tasks = [{"path": str(path), "start": a, "end": b, "columns": list(head.columns), "dtypes": dtypes,
+              "options": dialect.read_kwargs(), "chunksize": chunksize, "count_cols": count_cols, "max_centroids": max_centroids,
+              "shift": shift.to_dict()}
+             for a, b in split_ranges(path, start, piece_bytes)]
+    stats = StreamStats(count_cols, max_centroids, shift)
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        for part in pool.map(_scan_range, tasks):
+            stats.merge(part)
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Statistiques d'un CSV en un passage par blocs.")
+    parser.add_argument("path", type=Path, nargs="?", default=DATA_PATH)
+    parser.add_argument("--chunksize", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--jobs", type=int, default=1, help=f"processus (machine : {os.cpu_count()})")
+    args = parser.parse_args()
+    stats = scan_csv(args.path, args.chunksize, args.jobs)
+    print(stats.info())
+    print(stats.describe())
+    print(stats.corr().round(3))
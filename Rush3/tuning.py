@@ -0,0 +1,146 @@
+# tuning.py
+"""Choix de k du KNN de methodes.py par validation croisée stratifiée sur bad_client_target.
+
+    python3 tuning.py --k-max 50 --folds 5 --jobs 4   # exactitude / AUC par k, k conseillé
+
+Un seul KD-tree et une seule requête par pli, jusqu'à k_max voisins : la classe des voisins est gardée
+dans l'ordre de distance, et la part de mauvais payeurs parmi les k premiers (somme cumulée) donne
+d'un coup les scores de tous les k de 1 à k_max. Les plis sont répartis sur un pool de processus.
+Les classes des voisins sont en cache par fichier, plis et graine : relancer avec un k_max plus petit
+ne refait aucune requête.
+"""
+import argparse
+import hashlib
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import StratifiedKFold
+from sklearn.neighbors import KDTree
+
+from scoring import DATA_PATH, _fingerprint, load_model
+
+CACHE_DIR = Path(".cache_tuning")
+K_MAX = 50
+N_FOLDS = 5
+QUERY_ROWS = 65_536  # points interrogés par appel au KD-tree (mémoire des distances bornée)
+RANDOM_STATE = 0
+METRICS = ("accuracy", "auc")
+CACHED = re.compile(r"fold(\d+)_k(\d+)\.npy")  # fichiers terminés (pas les .npy.part d'un calcul interrompu)
+
+
+def _cache_root(path, n_folds: int, random_state: int, cache_dir=CACHE_DIR) -> Path:
+    key = hashlib.sha256(repr((_fingerprint(path), n_folds, random_state)).encode()).hexdigest()[:16]
+    return Path(cache_dir) / key
+
+
+def _cached_ks(root: Path, fold: int) -> list:
+    """k_max des classes de voisins en cache pour un pli, par ordre croissant."""
+    found = (CACHED.fullmatch(f.name) for f in root.glob(f"fold{fold}_k*.npy"))
+    return sorted(int(m.group(2)) for m in found if m and int(m.group(1)) == fold)
+
+
+def _cached_labels(root: Path, fold: int, k_max: int):
+    """Classes des voisins d'un pli déjà calculées pour au moins k_max voisins, sinon None."""
+    for k in _cached_ks(root, fold):
+        if k >= k_max:
+            return np.load(root / f"fold{fold}_k{k}.npy", mmap_mode="r")[:, :k_max]
+    return None
+
+
+def neighbour_labels(X_train: np.ndarray, y_train: np.ndarray, X_test: np.ndarray, k_max: int) -> np.ndarray:
+    """(n_test, k_max) : classe des k_max plus proches voisins d'entraînement, du plus proche au plus lointain."""
+    tree = KDTree(X_train)
+    out = np.empty((len(X_test), k_max), dtype="int8")
+    for i in range(0, len(X_test), QUERY_ROWS):
+        out[i:i + QUERY_ROWS] = y_train[tree.query(X_test[i:i + QUERY_ROWS], k=k_max, return_distance=False)]
+    return out
+
+
+def fold_scores(labels: np.ndarray, y_test: np.ndarray) -> pd.DataFrame:
+    """Exactitude et AUC de chaque k sur un pli, depuis les classes des voisins (somme cumulée)."""
+    k = np.arange(1, labels.shape[1] + 1)
+    rates = np.cumsum(labels, axis=1, dtype="float64") / k  # (n_test, k_max) : taux de défaut des k voisins
+    # vote majoritaire, égalité -> 0 comme KNeighborsClassifier et scoring.py
+    accuracy = ((rates > 0.5) == y_test[:, None]).mean(axis=0)
+    both = len(np.unique(y_test)) == 2
+    auc = [roc_auc_score(y_test, rates[:, j]) if both else np.nan for j in range(len(k))]
+    return pd.DataFrame({"accuracy": accuracy, "auc": auc}, index=pd.Index(k, name="k"))
+
+
+def _run_fold(task: dict) -> pd.DataFrame:
+    """Tâche d'un processus : un pli, clients relus par load_model (en cache dans chaque processus)."""
+    model = load_model(task["path"])
+    train, test, k_max = task["train"], task["test"], task["k_max"]
+    root = Path(task["root"])
+    labels = _cached_labels(root, task["fold"], k_max)
+    if labels is None:
+        labels = neighbour_labels(model.X[train], model.y[train], model.X[test], k_max)
+        final = root / f"fold{task['fold']}_k{k_max}.npy"
+        tmp = final.with_name(final.name + ".part")  # renommé une fois complet ; ignoré par le cache sinon
+        with open(tmp, "wb") as f:
+            np.save(f, labels)
+        tmp.replace(final)
+    return fold_scores(np.asarray(labels), model.y[test].astype("int64")).assign(fold=task["fold"])
+
+
+def evaluate(path=DATA_PATH, k_max: int = K_MAX, n_folds: int = N_FOLDS, jobs: int = 1,
+             random_state: int = RANDOM_STATE, cache_dir=CACHE_DIR) -> pd.DataFrame:
+    """Moyenne et écart-type sur les plis de l'exactitude et de l'AUC, une ligne par k de 1 à k_max."""
+    model = load_model(path)
+    # un pli d'entraînement compte environ (n_folds - 1) / n_folds des clients
+    k_max = min(k_max, len(model) * (n_folds - 1) // n_folds)
+    if k_max < 1:
+        raise ValueError("trop peu de clients pour la validation croisée")
+    root = _cache_root(path, n_folds, random_state, cache_dir)
+    root.mkdir(parents=True, exist_ok=True)
+    folds = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=random_state)
+    tasks = [{"path": str(path), "fold": i, "train": train, "test": test, "k_max": k_max, "root": str(root)}
+             for i, (train, test) in enumerate(folds.split(model.X, model.y))]
+    if jobs <= 1:
+        parts = list(map(_run_fold, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            parts = list(pool.map(_run_fold, tasks))
+    per_fold = pd.concat(parts)
+    result = per_fold.groupby(level="k")[list(METRICS)].agg(["mean", "std"])
+    result.columns = [m if stat == "mean" else f"{m}_std" for m, stat in result.columns]
+    return result[[c for m in METRICS for c in (m, f"{m}_std")]]
+
+
+def recommend(result: pd.DataFrame, metric: str = "auc") -> int:
+    """k de meilleure moyenne pour metric ; à égalité, le plus petit k."""
+    return int(result[metric].idxmax())
+
+
+def cached_recommendation(path=DATA_PATH, metric: str = "auc", n_folds: int = N_FOLDS,
+                          random_state: int = RANDOM_STATE, cache_dir=CACHE_DIR):
+    """k conseillé si une évaluation est déjà en cache pour ce fichier (aucune requête au KD-tree), sinon None."""
+    root = _cache_root(path, n_folds, random_state, cache_dir)
+    computed = _cached_ks(root, 0)
+    if not computed:
+        return None
+    k_max = computed[-1]
+    if not all(_cached_labels(root, i, k_max) is not None for i in range(n_folds)):
+        return None
+    return recommend(evaluate(path, k_max, n_folds, 1, random_state, cache_dir), metric)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Choix de k du KNN par validation croisée stratifiée.")
+    parser.add_argument("path", type=Path, nargs="?", default=DATA_PATH)
+    parser.add_argument("--k-max", type=int, default=K_MAX)
+    parser.add_argument("--folds", type=int, default=N_FOLDS)
+    parser.add_argument("--jobs", type=int, default=1, help="processus (un pli par tâche)")
+    parser.add_argument("--metric", choices=METRICS, default="auc", help="critère du k conseillé")
+    parser.add_argument("--seed", type=int, default=RANDOM_STATE)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    result = evaluate(args.path, args.k_max, args.folds, args.jobs, args.seed)
+    print(result.round(4).to_string())
+    print(f"k conseillé ({args.metric}) : {recommend(result, args.metric)} ({time.perf_counter() - t0:.2f}s)")
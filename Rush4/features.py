@@ -0,0 +1,187 @@
+# features.py
+"""Variables dérivées de Camp_Market, déclarées une fois pour tous les notebooks et la segmentation.
+
+    fe = build("Camp_Market.csv")                # colonnes brutes + variables, en cache sur disque
+    compute(df, context(df), only=["Age", "TotalSpend"])
+
+Chaque variable est une opération colonne par colonne sur ses entrées (brutes ou déjà dérivées) ;
+les libellés simplifiés (statut marital, éducation) passent par des tables de correspondance.
+Une variable dont une entrée manque dans le fichier est ignorée, comme les `if ... in fe.columns`
+des notebooks. Le résultat de build() est mis en cache, clé : empreinte du contenu du fichier.
+"""
+import argparse
+import hashlib
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+import rootpath  # noqa: F401  (ingest.py, à la racine du dépôt)
+from ingest import read_csv
+
+DATA_PATH = Path("Camp_Market.csv")
+CACHE_DIR = Path(".cache_features")
+VERSION = 1  # à incrémenter quand une définition change (invalide le cache)
+
+MNT = ("MntWines", "MntFruits", "MntMeatProducts", "MntFishProducts", "MntSweetProducts", "MntGoldProds")
+CMP = ("AcceptedCmp1", "AcceptedCmp2", "AcceptedCmp3", "AcceptedCmp4", "AcceptedCmp5")
+CHANNELS = ("NumWebPurchases", "NumCatalogPurchases", "NumStorePurchases")
+
+# Tables de correspondance (valeurs absentes -> valeur par défaut)
+MARITAL = {"Married": "En couple", "Together": "En couple"}, "Célibataire"
+EDUCATION = {"PhD": "PostGrad", "Master": "PostGrad", "Graduation": "Grad"}, "UnderGrad"
+# codes du LabelEncoder de PGD52023 (classes triées)
+LIVING_CODES = {"Célibataire": 0, "En couple": 1}
+EDUCATION_CODES = {"Grad": 0, "PostGrad": 1, "UnderGrad": 2}
+
+
+@dataclass(frozen=True)
+class Feature:
+    name: str
+    inputs: tuple
+    compute: Callable  # (df, ctx) -> Series ; df contient les entrées, ctx les constantes de référence
+
+
+def _map(col: str, table: tuple):
+    """Correspondance appliquée aux modalités distinctes seulement, puis étendue par les codes."""
+    mapping, default = table
+    categories = sorted(set(mapping.values()) | {default})  # mêmes catégories dans tous les blocs
+
+    def apply(d, ctx):
+        codes, uniques = pd.factorize(d[col])
+        labels = [mapping.get(v, default) for v in uniques] + [default]  # code -1 (valeur manquante) -> défaut
+        lut = np.array([categories.index(label) for label in labels])
+        return pd.Series(pd.Categorical.from_codes(lut[codes], categories), index=d.index)
+
+    return apply
+
+
+def _total(cols):
+    """Somme des colonnes, valeurs manquantes comptées 0 (comme sum(axis=1)), sans passer par les lignes."""
+    return lambda d, ctx: sum(d[c].fillna(0) for c in cols)
+
+
+def _share(col: str):
+    return lambda d, ctx: d[col] / d["TotalPurchases"].replace(0, np.nan)
+
+
+PIPELINE = [
+    Feature("Age", ("Year_Birth",), lambda d, ctx: ctx["year"] - d["Year_Birth"]),
+    Feature("KidsTotal", ("Kidhome", "Teenhome"), lambda d, ctx: d["Kidhome"] + d["Teenhome"]),
+    Feature("HasKids", ("KidsTotal",), lambda d, ctx: (d["KidsTotal"] > 0).astype("int64")),
+    Feature("CustomerSeniority_days", ("Dt_Customer",), lambda d, ctx: (ctx["today"] - d["Dt_Customer"]).dt.days),
+    Feature("Customer_for", ("Dt_Customer",), lambda d, ctx: (ctx["max_date"] - d["Dt_Customer"]).dt.days),
+    Feature("TotalSpend", MNT, _total(MNT)),
+    Feature("AvgBasket", ("TotalSpend",), lambda d, ctx: d["TotalSpend"].where(d["TotalSpend"] > 0)),
+    Feature("TotalPurchases", CHANNELS, _total(CHANNELS)),
+    *[Feature(c.replace("Num", "Share_"), (c, "TotalPurchases"), _share(c)) for c in CHANNELS],
+    Feature("AcceptedCmpTotal", CMP, _total(CMP)),
+    Feature("AcceptedAny", ("AcceptedCmpTotal",), lambda d, ctx: (d["AcceptedCmpTotal"] > 0).astype("int64")),
+    Feature("Total_Acc_Cmp", ("AcceptedCmpTotal", "Response"), lambda d, ctx: d["AcceptedCmpTotal"] + d["Response"]),
+    # RFM (Marketing_Campaign_Analysis)
+    Feature("R_recency", ("Recency",), lambda d, ctx: d["Recency"]),
+    Feature("F_frequency", ("TotalPurchases",), lambda d, ctx: d["TotalPurchases"]),
+    Feature("M_monetary", ("TotalSpend",), lambda d, ctx: d["TotalSpend"]),
+    # noms de PGD52023
+    Feature("Spent", ("TotalSpend",), lambda d, ctx: d["TotalSpend"]),
+    Feature("Children", ("KidsTotal",), lambda d, ctx: d["KidsTotal"]),
+    Feature("Is_parent", ("HasKids",), lambda d, ctx: d["HasKids"]),
+    Feature("Living_with", ("Marital_Status",), _map("Marital_Status", MARITAL)),
+    Feature("Family_size", ("Children", "Living_with"),
+            lambda d, ctx: d["Children"] + np.where(d["Living_with"] == "En couple", 2, 1)),
+    Feature("Education2", ("Education",), _map("Education", EDUCATION)),
+    Feature("Living_with_enc", ("Living_with",), lambda d, ctx: d["Living_with"].map(LIVING_CODES).astype("int64")),
+    Feature("Education2_enc", ("Education2",), lambda d, ctx: d["Education2"].map(EDUCATION_CODES).astype("int64")),
+]
+
+
+def _plan(columns, only=None) -> list:
+    """Variables calculables avec les colonnes présentes (et, si only, seulement leurs dépendances)."""
+    available = set(columns)
+    plan = []
+    for f in PIPELINE:
+        if all(i in available for i in f.inputs):
+            plan.append(f)
+            available.add(f.name)
+    if only is None:
+        return plan
+    needed = set(only)
+    for f in reversed(plan):
+        if f.name in needed:
+            needed.update(f.inputs)
+    return [f for f in plan if f.name in needed]
+
+
+def parse_dates(df: pd.DataFrame) -> pd.DataFrame:
+    if "Dt_Customer" in df.columns and not pd.api.types.is_datetime64_any_dtype(df["Dt_Customer"]):
+        df = df.assign(Dt_Customer=pd.to_datetime(df["Dt_Customer"], format="%Y-%m-%d", errors="coerce"))
+    return df
+
+
+def context(df: pd.DataFrame = None, max_date=None) -> dict:
+    """Constantes de référence : année et jour courants, date d'enrôlement la plus récente."""
+    if max_date is None and df is not None and "Dt_Customer" in df.columns:
+        max_date = parse_dates(df[["Dt_Customer"]])["Dt_Customer"].max()
+    return {"year": datetime.now().year, "today": pd.Timestamp.now().normalize(), "max_date": max_date}
+
+
+def compute(df: pd.DataFrame, ctx: dict, only=None) -> pd.DataFrame:
+    """Variables dérivées de df, dans l'ordre de PIPELINE ; only : colonnes voulues (brutes ou dérivées)."""
+    work = parse_dates(df).copy(deep=False)  # les variables s'y ajoutent sans toucher df
+    names = []
+    for f in _plan(df.columns, only):
+        work[f.name] = f.compute(work, ctx)
+        names.append(f.name)
+    return work[names if only is None else [c for c in only if c in work.columns]]
+
+
+# === Fichier entier, par blocs, avec cache ===
+
+def read_customers(path=DATA_PATH, chunksize=None, usecols=None):
+    """Fichier entier ou itérateur de blocs (séparateur et encodage détectés par ingest.py)."""
+    reader = read_csv(path, chunksize=chunksize, usecols=usecols)
+    return [reader] if chunksize is None else reader
+
+
+def file_hash(path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()[:16]
+
+
+def build(path=DATA_PATH, chunksize=None, cache_dir=CACHE_DIR) -> pd.DataFrame:
+    """Colonnes brutes + variables dérivées ; relu du cache si le fichier n'a pas changé (et le même jour,
+    pour CustomerSeniority_days)."""
+    cache = None
+    if cache_dir is not None:
+        key = f"{file_hash(path)}-v{VERSION}-{pd.Timestamp.now():%Y%m%d}"
+        cache = Path(cache_dir) / f"{key}.pkl"
+        if cache.exists():
+            return pd.read_pickle(cache)
+    if chunksize is None:
+        df = parse_dates(next(iter(read_customers(path))))
+        result = df.join(compute(df, context(df)))
+    else:
+        # date maximale sur tout le fichier avant de calculer les blocs
+        dates = [parse_dates(c)["Dt_Customer"].max()
+                 for c in read_customers(path, chunksize, usecols=["Dt_Customer"])]
+        ctx = context(max_date=max(dates) if dates else None)
+        result = pd.concat([parse_dates(c).join(compute(c, ctx)) for c in read_customers(path, chunksize)])
+    if cache is not None:
+        cache.parent.mkdir(exist_ok=True)
+        result.to_pickle(cache)
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Variables dérivées de Camp_Market.")
+    parser.add_argument("path", type=Path, nargs="?", default=DATA_PATH)
+    parser.add_argument("--chunksize", type=int, default=None)
+    args = parser.parse_args()
+    fe = build(args.path, args.chunksize)
+    print(fe[[f.name for f in PIPELINE if f.name in fe.columns]].describe(include="all").T)
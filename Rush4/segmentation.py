@@ -0,0 +1,246 @@
+# segmentation.py
+"""Segmentation clients Camp_Market (chaîne de PGD52023.ipynb) : StandardScaler -> PCA(3) -> k-means.
+
+    python3 segmentation.py --k 4                 # ajuste (ou relit le cache) et affiche le profil des segments
+    python3 segmentation.py --sweep 2 10 --jobs 4 # inertie et silhouette (sur échantillon) pour chaque k
+
+    seg = fit("Camp_Market.csv", k=4)
+    seg.assign(nouveaux_clients)                  # segment des nouveaux clients, sans réajuster
+
+Lecture par blocs possible (chunksize) : standardisation et PCA incrémentales, k-means par mini-lots.
+Standardisation et PCA sont en cache par fichier (empreinte du contenu), le k-means par fichier et k :
+changer k ne refait pas la réduction. L'agglomératif (quadratique en mémoire) n'est pas repris.
+"""
+import argparse
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.decomposition import IncrementalPCA
+from sklearn.metrics import silhouette_score
+from sklearn.preprocessing import StandardScaler
+
+from features import compute, file_hash, read_customers
+
+DATA_PATH = Path("Camp_Market.csv")
+CACHE_DIR = Path(".cache_segmentation")
+FEATURES = ["Age", "Income", "Spent", "Living_with_enc", "Children", "Family_size", "Is_parent",
+            "Education2_enc", "Customer_for"]
+SUMMARY_COLS = ["Age", "Income", "Spent", "Children", "Customer_for", "Family_size", "Is_parent"]
+N_COMPONENTS = 3
+BATCH_ROWS = 65_536      # lots de la PCA incrémentale et de l'assignation
+SILHOUETTE_SAMPLE = 10_000
+RANDOM_STATE = 0
+
+
+# === Variables (définitions de features.py) ===
+
+@dataclass
+class Reference:
+    """Constantes figées à l'ajustement, réappliquées telles quelles aux nouveaux clients."""
+
+    year: int                    # année courante pour Age
+    max_date: pd.Timestamp       # date d'enrôlement la plus récente, pour Customer_for
+    income_bounds: tuple         # percentiles 1 et 99 du revenu (valeurs aberrantes exclues de l'ajustement)
+
+
+def features(df: pd.DataFrame, ref: Reference) -> pd.DataFrame:
+    """Matrice des FEATURES ; lignes incomplètes à NaN (écartées par l'appelant)."""
+    ctx = {"year": ref.year, "max_date": ref.max_date, "today": pd.Timestamp.now().normalize()}
+    return compute(df, ctx, only=FEATURES).astype("float64")
+
+
+def _training_rows(df: pd.DataFrame, ref: Reference) -> pd.Series:
+    """Filtre du notebook : lignes complètes, revenu strictement entre les percentiles 1 et 99."""
+    lo, hi = ref.income_bounds
+    return df.notna().all(axis=1) & (df["Income"] > lo) & (df["Income"] < hi)
+
+
+def reference(path=DATA_PATH, chunksize=None) -> Reference:
+    """Premier passage léger : percentiles du revenu et date maximale, sur les lignes complètes."""
+    incomes, max_date = [], pd.NaT
+    for chunk in read_customers(path, chunksize):
+        chunk = chunk.dropna()
+        incomes.append(chunk["Income"].to_numpy(dtype="float64"))
+        last = pd.to_datetime(chunk["Dt_Customer"], errors="coerce").max()
+        max_date = last if pd.isna(max_date) else max(max_date, last)
+    income = pd.Series(np.concatenate(incomes))
+    return Reference(datetime.now().year, max_date, (income.quantile(0.01), income.quantile(0.99)))
+
+
+# === Modèle ===
+
+class Segmentation:
+    """Réduction (standardisation + PCA) d'un fichier clients et k-means sur ses composantes."""
+
+    def __init__(self, ref: Reference, scaler: StandardScaler, pca: IncrementalPCA, root: Path):
+        self.ref = ref
+        self.scaler = scaler
+        self.pca = pca
+        self.root = root        # dossier de cache du fichier : projections et k-means par k
+        self.kmeans = None
+
+    @property
+    def k(self):
+        return None if self.kmeans is None else self.kmeans.n_clusters
+
+    def projections(self, mmap: bool = True) -> np.ndarray:
+        """Composantes des lignes d'ajustement (n, N_COMPONENTS), ouvertes par memmap."""
+        return np.load(self.root / "Z.npy", mmap_mode="r" if mmap else None)
+
+    def rows(self) -> np.ndarray:
+        """Position dans le fichier de chaque ligne d'ajustement."""
+        return np.load(self.root / "rows.npy")
+
+    def transform(self, X: np.ndarray) -> np.ndarray:
+        return self.pca.transform(self.scaler.transform(X))
+
+    def with_k(self, k: int, random_state: int = RANDOM_STATE) -> "Segmentation":
+        """k-means sur les composantes en cache, relu s'il a déjà été ajusté pour ce k."""
+        path = self.root / f"kmeans_k{k}_rs{random_state}.joblib"
+        if path.exists():
+            self.kmeans = joblib.load(path)
+        else:
+            self.kmeans = _kmeans(self.projections(mmap=False), k, random_state)
+            joblib.dump(self.kmeans, path)
+        return self
+
+    def labels(self) -> pd.Series:
+        """Segment de chaque ligne d'ajustement, indexé par position dans le fichier."""
+        return pd.Series(self.kmeans.labels_, index=self.rows(), name="Cluster")
+
+    def assign(self, df: pd.DataFrame) -> pd.Series:
+        """Segment de nouveaux clients (colonnes brutes du fichier) ; <NA> si une variable manque."""
+        X = features(df, self.ref)
+        ok = X.notna().all(axis=1).to_numpy()
+        out = pd.Series(pd.NA, index=df.index, dtype="Int64", name="Cluster")
+        values = X.to_numpy()[ok]
+        labels = [self.kmeans.predict(self.transform(values[i:i + BATCH_ROWS]))
+                  for i in range(0, len(values), BATCH_ROWS)]
+        if labels:
+            out[ok] = np.concatenate(labels)
+        return out
+
+    def summary(self, path=DATA_PATH, chunksize=None) -> pd.DataFrame:
+        """Moyennes par segment (section 7 du notebook), cumulées bloc par bloc."""
+        sums, start = None, 0
+        labels = self.labels()
+        for chunk in read_customers(path, chunksize):
+            chunk.index = np.arange(start, start + len(chunk))
+            start += len(chunk)
+            lab = labels.reindex(chunk.index).dropna()
+            X = features(chunk.loc[lab.index], self.ref)[SUMMARY_COLS]
+            part = X.groupby(lab.astype("int64").to_numpy()).agg(["sum", "count"])
+            sums = part if sums is None else sums.add(part, fill_value=0)
+        means = sums.xs("sum", axis=1, level=1) / sums.xs("count", axis=1, level=1)
+        return means.rename_axis("Cluster").round(1)
+
+
+def _kmeans(Z: np.ndarray, k: int, random_state: int = RANDOM_STATE) -> MiniBatchKMeans:
+    return MiniBatchKMeans(n_clusters=k, random_state=random_state, n_init="auto",
+                           batch_size=min(4096, max(len(Z), 1))).fit(Z)
+
+
+def reduce(path=DATA_PATH, chunksize=None, cache_dir=CACHE_DIR) -> Segmentation:
+    """Standardisation + PCA d'un fichier, en cache sous cache_dir/<empreinte du fichier>/."""
+    root = Path(cache_dir) / file_hash(path)
+    if (root / "reduction.joblib").exists():
+        ref, scaler, pca = joblib.load(root / "reduction.joblib")
+        return Segmentation(ref, scaler, pca, root)
+
+    tmp = root.with_name(root.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    ref = reference(path, chunksize)
+
+    # passage 1 : variables des lignes retenues, écrites sur disque ; moyennes / écarts-types incrémentaux
+    scaler = StandardScaler()
+    rows, start = [], 0
+    with open(tmp / "X.f64", "wb") as f:
+        for chunk in read_customers(path, chunksize):
+            X = features(chunk, ref)
+            keep = (_training_rows(chunk, ref) & X.notna().all(axis=1)).to_numpy()
+            rows.append(np.flatnonzero(keep) + start)
+            start += len(chunk)
+            X = X.to_numpy()[keep]
+            if len(X):
+                scaler.partial_fit(X)
+                X.tofile(f)
+    X = np.memmap(tmp / "X.f64", dtype="float64", mode="r").reshape(-1, len(FEATURES))
+
+    # passage 2 : PCA incrémentale par lots, puis projections
+    pca = IncrementalPCA(n_components=N_COMPONENTS)
+    batches = [(i, min(i + BATCH_ROWS, len(X))) for i in range(0, len(X), BATCH_ROWS)]
+    if len(batches) > 1 and batches[-1][1] - batches[-1][0] < N_COMPONENTS:
+        batches[-2:] = [(batches[-2][0], batches[-1][1])]  # dernier lot trop petit pour partial_fit
+    for i, j in batches:
+        pca.partial_fit(scaler.transform(X[i:j]))
+    Z = np.lib.format.open_memmap(tmp / "Z.npy", mode="w+", dtype="float64", shape=(len(X), N_COMPONENTS))
+    for i, j in batches:
+        Z[i:j] = pca.transform(scaler.transform(X[i:j]))
+    Z.flush()
+    del X, Z
+    (tmp / "X.f64").unlink()
+    np.save(tmp / "rows.npy", np.concatenate(rows))
+    joblib.dump((ref, scaler, pca), tmp / "reduction.joblib")
+    shutil.rmtree(root, ignore_errors=True)
+    tmp.rename(root)
+    return Segmentation(ref, scaler, pca, root)
+
+
+def fit(path=DATA_PATH, k: int = 4, chunksize=None, cache_dir=CACHE_DIR,
+        random_state: int = RANDOM_STATE) -> Segmentation:
+    return reduce(path, chunksize, cache_dir).with_k(k, random_state)
+
+
+# === Choix de k ===
+
+def _score_k(task: tuple) -> dict:
+    """Tâche d'un processus : un k, composantes relues par memmap (rien de gros n'est transmis)."""
+    z_path, k, sample_size, random_state = task
+    Z = np.load(z_path, mmap_mode="r")
+    km = _kmeans(np.asarray(Z), k, random_state)
+    rng = np.random.default_rng(random_state)
+    idx = np.sort(rng.choice(len(Z), size=min(sample_size, len(Z)), replace=False))
+    sil = silhouette_score(Z[idx], km.labels_[idx]) if k < len(idx) else np.nan
+    return {"k": k, "inertie": km.inertia_, "silhouette": sil}
+
+
+def sweep(seg: Segmentation, ks=range(2, 8), sample_size: int = SILHOUETTE_SAMPLE, jobs: int = 1,
+          random_state: int = RANDOM_STATE) -> pd.DataFrame:
+    """Inertie et silhouette (échantillon de sample_size lignes) pour chaque k, k répartis sur jobs processus."""
+    tasks = [(str(seg.root / "Z.npy"), k, sample_size, random_state) for k in ks]
+    if jobs <= 1:
+        results = list(map(_score_k, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(_score_k, tasks))
+    return pd.DataFrame(results).set_index("k")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Segmentation clients Camp_Market.")
+    parser.add_argument("path", type=Path, nargs="?", default=DATA_PATH)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--chunksize", type=int, default=None, help="lecture par blocs de N lignes")
+    parser.add_argument("--sweep", type=int, nargs=2, metavar=("K_MIN", "K_MAX"), default=None)
+    parser.add_argument("--jobs", type=int, default=1)
+    parser.add_argument("--sample", type=int, default=SILHOUETTE_SAMPLE, help="lignes pour la silhouette")
+    args = parser.parse_args()
+
+    seg = reduce(args.path, args.chunksize)
+    print("Variance expliquée cumulée :", seg.pca.explained_variance_ratio_.cumsum().round(3))
+    if args.sweep:
+        scores = sweep(seg, range(args.sweep[0], args.sweep[1] + 1), args.sample, args.jobs)
+        print(scores)
+        print("k conseillé (silhouette) :", int(scores["silhouette"].idxmax()))
+    else:
+        seg.with_k(args.k)
+        print(seg.labels().value_counts().sort_index().rename("effectif"))
+        print(seg.summary(args.path, args.chunksize))
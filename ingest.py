@@ -0,0 +1,231 @@
+# ingest.py
+"""Lecture CSV commune aux Rush : dialecte détecté une fois sur un échantillon, puis moteur C de pandas.
+
+    python3 ingest.py "Rush1/Data Youtube Channels - youtube-channels.csv"   # dialecte + aperçu
+
+    from ingest import read_csv, sniff
+    df = read_csv("Camp_Market.csv", dtype={"Income": "float64"})
+    for chunk in read_csv(path, chunksize=100_000): ...
+
+Détectés sur les premiers Ko : séparateur, encodage (BOM, UTF-8, sinon le codage 8 bits qui donne
+le texte le plus plausible), séparateurs décimal et de milliers ("11 496 766,01").
+Le dialecte est gardé en mémoire et dans <dossier>/.csv_dialects.json (clé : nom, taille, mtime).
+
+Depuis un sous-dossier RushN (scripts lancés depuis leur dossier), via RushN/rootpath.py :
+    import rootpath  # noqa: F401
+    from ingest import read_csv
+"""
+import codecs
+import csv
+import json
+import re
+import sys
+import threading
+from collections import Counter
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import pandas as pd
+
+SAMPLE_BYTES = 64 * 1024
+DELIMITERS = ",;\t|"
+CACHE_NAME = ".csv_dialects.json"
+# codages 8 bits essayés quand l'échantillon n'est pas de l'UTF-8 (égalité : le premier l'emporte)
+FALLBACK_ENCODINGS = ("cp1252", "mac_roman", "latin-1")
+
+GROUP_MARKS = " \u00a0.,'"  # espace, espace insécable, point, virgule, apostrophe
+_NUMBER = re.compile(r"^[-+]?\d[\d%s]*$" % re.escape(GROUP_MARKS))
+_GROUPED = {sep: re.compile(r"^[-+]?\d{1,3}(?:%s\d{3})+(?:[.,]\d+)?$" % re.escape(sep)) for sep in GROUP_MARKS}
+_memo = {}
+_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class Dialect:
+    sep: str = ","
+    encoding: str = "utf-8"
+    decimal: str = "."
+    thousands: str = None
+
+    def read_kwargs(self) -> dict:
+        """Options de pd.read_csv correspondantes."""
+        out = {"sep": self.sep, "encoding": self.encoding, "decimal": self.decimal}
+        if self.thousands:
+            out["thousands"] = self.thousands
+        return out
+
+
+# === Détection ===
+
+def _encoding(raw: bytes) -> tuple:
+    """(encodage, texte décodé) de l'échantillon."""
+    if raw.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig", raw[len(codecs.BOM_UTF8):].decode("utf-8", errors="replace")
+    for bom, name in ((codecs.BOM_UTF16_LE, "utf-16"), (codecs.BOM_UTF16_BE, "utf-16")):
+        if raw.startswith(bom):
+            return name, raw.decode(name, errors="replace")
+    try:
+        return "utf-8", raw.decode("utf-8")
+    except UnicodeDecodeError:
+        pass
+    # texte le plus plausible : lettres hors ASCII, sans contrôles ni majuscule accentuée en milieu de mot
+    def score(text: str) -> int:
+        s = 0
+        for prev, ch in zip(" " + text, text):
+            if ord(ch) < 128:
+                continue
+            if ch.isalpha():
+                s += -1 if (ch.isupper() and prev.islower()) else 1
+            else:
+                s -= 2 if not ch.isprintable() else 1
+        return s
+
+    decoded = [(name, raw.decode(name, errors="replace")) for name in FALLBACK_ENCODINGS]
+    return max(decoded, key=lambda item: score(item[1]))
+
+
+def _delimiter(lines: list) -> str:
+    try:
+        return csv.Sniffer().sniff("\n".join(lines[:50]), delimiters=DELIMITERS).delimiter
+    except csv.Error:
+        # séparateur le plus fréquent, à nombre constant sur les lignes
+        counts = {d: Counter(line.count(d) for line in lines) for d in DELIMITERS}
+        best = max(counts, key=lambda d: (counts[d].most_common(1)[0][0] > 0, counts[d].most_common(1)[0][1]))
+        return best if counts[best].most_common(1)[0][0] > 0 else ","
+
+
+def _numbers(fields, sep: str) -> tuple:
+    """(décimal, milliers) par vote sur les champs numériques de l'échantillon."""
+    decimal, thousands = Counter(), Counter()
+    for field in fields:
+        field = field.strip()
+        if not _NUMBER.match(field) or not any(c.isdigit() for c in field):
+            continue
+        marks = [c for c in field if c in GROUP_MARKS]
+        if not marks:
+            continue
+        if "," in marks and "." in marks:
+            last = max(field.rfind(","), field.rfind("."))
+            decimal[field[last]] += 2
+            thousands["." if field[last] == "," else ","] += 2
+            continue
+        for t in " \u00a0'":  # milliers sans ambiguïté avec la décimale
+            if _GROUPED[t].match(field):
+                thousands[t] += 2
+                tail = field.rsplit(t, 1)[1]
+                if "," in tail or "." in tail:
+                    decimal["," if "," in tail else "."] += 2
+                break
+        else:
+            mark = marks[-1]
+            if mark in ",." and marks.count(mark) == 1 and len(field) - field.rfind(mark) - 1 != 3:
+                decimal[mark] += 2  # 1,5 ou 2.25 : décimale sans ambiguïté
+            elif mark in ",." and _GROUPED[mark].match(field):
+                thousands[mark] += 1  # 1,000 : milliers probables, décimale à 3 chiffres possible
+    dec = decimal.most_common(1)[0][0] if decimal else "."
+    if dec == sep:
+        dec = "."
+    thousands.pop(dec, None)
+    thousands.pop(sep, None)
+    th = thousands.most_common(1)[0][0] if thousands else None
+    return dec, th
+
+
+def sniff_bytes(raw: bytes) -> Dialect:
+    """Dialecte d'un échantillon (début de fichier), lignes incomplètes de la fin écartées."""
+    cut = max(raw.rfind(b"\n"), raw.rfind(b"\r"))
+    if cut > 0:
+        raw = raw[:cut]
+    encoding, text = _encoding(raw)
+    lines = [line for line in text.splitlines() if line.strip()]
+    if not lines:
+        return Dialect(encoding=encoding)
+    sep = _delimiter(lines)
+    fields = (f for row in csv.reader(lines[1:], delimiter=sep) for f in row)
+    decimal, thousands = _numbers(fields, sep)
+    return Dialect(sep, encoding, decimal, thousands)
+
+
+def sniff_file(f, sample_bytes: int = SAMPLE_BYTES) -> Dialect:
+    """Dialecte d'un fichier ouvert en binaire (fichier importé, BytesIO), position remise au début."""
+    f.seek(0)
+    raw = f.read(sample_bytes)
+    f.seek(0)
+    return sniff_bytes(raw if isinstance(raw, bytes) else raw.encode("utf-8"))
+
+
+def _cache_key(path: Path) -> tuple:
+    st = path.stat()
+    return path.name, st.st_size, st.st_mtime_ns
+
+
+def sniff(path, sample_bytes: int = SAMPLE_BYTES) -> Dialect:
+    """Dialecte d'un fichier, détecté une fois tant que sa taille et son mtime ne changent pas."""
+    path = Path(path).resolve()
+    name, size, mtime = _cache_key(path)
+    key = (str(path), size, mtime)
+    with _lock:
+        if key in _memo:
+            return _memo[key]
+    cache_file = path.parent / CACHE_NAME
+    try:
+        disk = json.loads(cache_file.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        disk = {}
+    entry = disk.get(name)
+    if entry and entry.get("size") == size and entry.get("mtime_ns") == mtime:
+        dialect = Dialect(**entry["dialect"])
+    else:
+        with open(path, "rb") as f:
+            dialect = sniff_bytes(f.read(sample_bytes))
+        disk[name] = {"size": size, "mtime_ns": mtime, "dialect": asdict(dialect)}
+        try:
+            cache_file.write_text(json.dumps(disk, indent=2, ensure_ascii=False), encoding="utf-8")
+        except OSError:
+            pass  # dossier en lecture seule : cache en mémoire seulement
+    with _lock:
+        _memo[key] = dialect
+    return dialect
+
+
+# === Lecture ===
+
+def read_csv(path, dtype=None, chunksize=None, dialect: Dialect = None, **kwargs):
+    """pd.read_csv avec le dialecte détecté et le moteur C (options explicites de l'appelant prioritaires).
+
+    path peut aussi être un fichier ouvert (importé) : dialecte détecté sur son début, sans cache.
+    """
+    if dialect is None:
+        dialect = sniff_file(path) if hasattr(path, "read") else sniff(path)
+    options = {**dialect.read_kwargs(), "engine": "c", **kwargs}
+    return pd.read_csv(path, dtype=dtype, chunksize=chunksize, **options)
+
+
+def read_header(path) -> list:
+    return read_csv(path, nrows=0).columns.tolist()
+
+
+def split_ranges(path, start: int, piece_bytes: int) -> list:
+    """Découpe [start, fin du fichier) en tranches d'environ piece_bytes, alignées sur les fins de ligne."""
+    path = Path(path)
+    size = path.stat().st_size
+    bounds = [start]
+    with open(path, "rb") as f:
+        pos = start + piece_bytes
+        while pos < size:
+            f.seek(pos)
+            f.readline()
+            pos = f.tell()
+            if pos >= size:
+                break
+            bounds.append(pos)
+            pos += piece_bytes
+    bounds.append(size)
+    return [(a, b) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+
+if __name__ == "__main__":
+    for p in sys.argv[1:]:
+        d = sniff(p)
+        print(f"{p}: {d}")
+        print(read_csv(p, nrows=5).to_string())